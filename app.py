@@ -1,4 +1,5 @@
 import streamlit as st
+from utils import get_cache_stats
 
 st.set_page_config(
     page_title="Dashboard de Medios",
@@ -97,3 +98,22 @@ st.markdown("- Usuario: `okdiario_redaccion` | Contraseña: `okdiario_red123`")
 st.markdown("---")
 st.markdown("*Cada cuenta tiene 2 paneles: REDACCIÓN Y CLIENTE.*")
 st.markdown("*La idea es que ambos grupos de usuarios -redacción y cliente- vean la data que le es de interés*")
+
+st.markdown("---")
+
+st.markdown("### 🧠 Caché en memoria")
+cache_stats = get_cache_stats()
+cache_rows = [
+    {
+        'Caché': name,
+        'Entradas': cache_stats[name]['entries'],
+        'Memoria (MB)': round(cache_stats[name]['bytes'] / 1024 / 1024, 1),
+        'Hits': cache_stats[name]['hits'],
+        'Hits vencidos': cache_stats[name]['stale_hits'],
+        'Misses': cache_stats[name]['misses'],
+        'Descartes': cache_stats[name]['evictions']
+    }
+    for name in ('loaders', 'ga4_partitions')
+]
+st.caption(f"Presupuesto: {cache_stats['budget_bytes'] / 1024 / 1024:,.0f} MB")
+st.dataframe(pd.DataFrame(cache_rows), use_container_width=True, hide_index=True)
@@ -6,6 +6,7 @@ Este módulo contiene toda la lógica compartida entre dashboards de redacción
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
+from functools import cached_property
 import plotly.express as px
 import plotly.graph_objects as go
 import sys
@@ -14,19 +15,29 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils import (
-    load_google_sheet_data,
+    get_sheet_partition,
     get_ga4_data,
-    filter_media_urls,
+    get_ga4_data_planned,
+    build_historical_data,
     merge_sheets_with_ga4,
     create_media_config,
     normalize_url,
     check_login,
-    get_ga4_pageviews_data,
-    get_ga4_historical_data,
     get_ga4_growth_data,
     get_ga4_growth_data_custom,
     format_growth_percentage,
-    get_monthly_pageviews_by_sheets
+    refresh_property_data,
+    start_warmup_scheduler,
+    stop_warmup_scheduler,
+    get_warmup_status,
+    reset_served_data_age,
+    get_served_data_age,
+    get_sheet_partition_url_set,
+    get_sheet_url_index,
+    decode_urls,
+    ga4_property_now,
+    DASHBOARD_DEFAULT_COMPARISON_RANGE,
+    ga4_current_month_range
 )
 
 
@@ -166,41 +177,146 @@ def _render_sidebar_config(config):
 
     # Botón de actualización
     if st.sidebar.button(f"{icon_prefix}Actualizar datos"):
-        st.cache_data.clear()
-        st.rerun()
+        # Solo se invalidan los datos de esta propiedad (y el Sheet), no los de los demás medios
+        wait_seconds = refresh_property_data(config['property_id'])
+        if wait_seconds:
+            st.sidebar.info(f"{icon_prefix}Los datos se actualizaron hace instantes. Podés volver a actualizar en {wait_seconds} s.")
+        else:
+            st.rerun()
 
     return start_date_param, end_date_param
 
 
-def _load_data(config, start_date_param, end_date_param):
-    """Cargar datos de Google Sheets y GA4"""
-    credentials_file = config.get('credentials_file', 'credentials_analytics_acceso_medios.json')
+def _current_month_range(config):
+    """Rango del mes en curso en formato GA4 (en la zona horaria de la propiedad)"""
+    return ga4_current_month_range(config['property_id'])
 
-    with st.spinner('Cargando datos...'):
-        # Cargar datos del Google Sheet
-        sheets_df = load_google_sheet_data()
 
-        # Filtrar solo URLs del medio
-        if sheets_df is not None:
-            sheets_filtered = filter_media_urls(sheets_df, config['domain'])
-        else:
-            sheets_filtered = pd.DataFrame()
+def _comparison_date_range(config):
+    """
+    Rango de la comparativa dominio vs sheet según los widgets de la sección.
+    Se lee de session_state para poder planificar las consultas antes de dibujarla.
+    """
+    if config['page_type'] == 'redaccion':
+        return _current_month_range(config)
 
-        # Cargar datos de GA4
-        ga4_df = get_ga4_data(
-            config['property_id'],
-            credentials_file,
-            start_date=start_date_param,
-            end_date=end_date_param
+    comparison_date_option = st.session_state.get(
+        f"comparison_date_range_{config['medio']}", DASHBOARD_DEFAULT_COMPARISON_RANGE[0]
+    )
+    if comparison_date_option == "Personalizado":
+        comparison_start_date = st.session_state.get(
+            f"comparison_start_{config['medio']}", datetime.now() - timedelta(days=7)
         )
+        comparison_end_date = st.session_state.get(f"comparison_end_{config['medio']}", datetime.now())
+        return comparison_start_date.strftime("%Y-%m-%d"), comparison_end_date.strftime("%Y-%m-%d")
+
+    return comparison_date_option, "today"
+
 
-    return sheets_filtered, ga4_df, credentials_file
+class _DashboardData:
+    """
+    Datos compartidos por las secciones del dashboard durante un rerun.
+    
+    Cada dataset (Sheet filtrado, cortes GA4 por rango, merges con el Sheet)
+    se calcula una sola vez, la primera vez que alguna sección lo pide, y
+    las demás reciben el mismo objeto. Los rangos GA4 de
+    todas las secciones se piden juntos para que el planner los resuelva con
+    el mínimo de requests.
+    
+    Las secciones son fragments: al interactuar con un widget solo se vuelve
+    a ejecutar esa sección, que recibe este mismo objeto del último rerun
+    completo y reutiliza lo ya calculado.
+    """
 
+    def __init__(self, config, date_range):
+        self.config = config
+        self.credentials_file = config.get('credentials_file', 'credentials_analytics_acceso_medios.json')
+        # Rangos GA4 que necesitan las secciones: sidebar, mes en curso y comparativa
+        self.date_range = date_range
+        self.month_range = _current_month_range(config)
+        self.comparison_range = _comparison_date_range(config)
+        self._frames = {}
+        self._merged = {}
+
+    @cached_property
+    def sheets_filtered(self):
+        """URLs del medio en el Google Sheet"""
+        return get_sheet_partition(self.config['medio'])
+
+    @cached_property
+    def ga4_frames(self):
+        """Cortes pagePath x date de los rangos planificados"""
+        return get_ga4_data_planned(
+            self.config['property_id'],
+            self.credentials_file,
+            [self.date_range, self.month_range, self.comparison_range]
+        )
 
-def _render_gauge_section(config, total_monthly_pageviews):
+    def ga4_frame(self, date_range):
+        """Datos GA4 de un rango; si no estaba planificado se piden aparte"""
+        if date_range in self.ga4_frames:
+            return self.ga4_frames[date_range]
+        if date_range not in self._frames:
+            self._frames[date_range] = get_ga4_data(
+                self.config['property_id'],
+                self.credentials_file,
+                start_date=date_range[0],
+                end_date=date_range[1]
+            )
+        return self._frames[date_range]
+
+    def merged(self, date_range):
+        """Sheet mergeado con los datos GA4 de un rango"""
+        if date_range not in self._merged:
+            self._merged[date_range] = merge_sheets_with_ga4(
+                self.sheets_filtered, self.ga4_frame(date_range), self.config['domain']
+            )
+        return self._merged[date_range]
+
+    @property
+    def ga4_df(self):
+        return self.ga4_frame(self.date_range)
+
+    @property
+    def merged_df(self):
+        return self.merged(self.date_range)
+
+    @property
+    def ga4_monthly_df(self):
+        return self.ga4_frame(self.month_range)
+
+    @property
+    def sheets_urls_handle(self):
+        """
+        Handle de las URLs del Sheet para las claves de los loaders cacheados.
+        Es el que se registró al partir el Sheet; se resuelve en cada acceso
+        porque un fragment puede volver a correr cuando el registro ya lo
+        descartó (en ese caso se registra de nuevo desde la partición).
+        """
+        return get_sheet_partition_url_set(self.sheets_filtered)
+
+    @property
+    def sheets_url_index(self):
+        """SheetUrlIndex compartido (el mismo que resuelven los loaders por handle)"""
+        return get_sheet_url_index(self.sheets_urls_handle)
+
+    @cached_property
+    def monthly_pageviews(self):
+        """Page views del mes en curso de los artículos del Sheet"""
+        ga4_monthly_df = self.ga4_monthly_df
+        if ga4_monthly_df is None or ga4_monthly_df.empty or self.sheets_filtered.empty:
+            return 0
+        merged_monthly = self.merged(self.month_range)
+        if merged_monthly.empty or 'screenPageViews' not in merged_monthly.columns:
+            return 0
+        return merged_monthly['screenPageViews'].sum()
+
+
+@st.fragment
+def _render_gauge_section(config, data):
     """Renderizar sección de gauge de objetivo mensual"""
     monthly_goal = config.get('monthly_goal', 3000000)
-    current_progress = total_monthly_pageviews
+    current_progress = data.monthly_pageviews
     progress_percentage = (current_progress / monthly_goal) * 100 if monthly_goal > 0 else 0
 
     icon_prefix = "" if config['page_type'] == 'redaccion' else ""
@@ -257,7 +373,8 @@ def _render_gauge_section(config, total_monthly_pageviews):
     st.plotly_chart(fig, use_container_width=True)
 
 
-def _render_progression_section(config, merged_df, credentials_file):
+@st.fragment
+def _render_progression_section(config, data):
     """Renderizar sección de progresión del objetivo"""
     is_redaccion = config['page_type'] == 'redaccion'
     title = "##  Real vs Objetivo" if is_redaccion else "## Progresión del Objetivo a lo largo del Mes"
@@ -266,7 +383,7 @@ def _render_progression_section(config, merged_df, credentials_file):
     st.markdown(title)
 
     # Información adicional
-    current_date = datetime.now()
+    current_date = ga4_property_now(config['property_id'])
     days_in_month = current_date.day
 
     # Calcular días totales del mes actual
@@ -279,30 +396,8 @@ def _render_progression_section(config, merged_df, credentials_file):
 
     monthly_goal = config.get('monthly_goal', 3000000)
 
-    # Calcular métricas
-    sheets_urls = None
-    if not merged_df.empty and 'url_normalized' in merged_df.columns:
-        sheets_urls = merged_df['url_normalized'].dropna().unique().tolist()
-
     # Calcular progreso actual del mes
-    current_month_start = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-    current_month_today = datetime.now().strftime('%Y-%m-%d')
-
-    ga4_monthly_df = get_ga4_data(
-        config['property_id'],
-        credentials_file,
-        start_date=current_month_start,
-        end_date=current_month_today
-    )
-
-    total_monthly_pageviews = 0
-    if ga4_monthly_df is not None and not ga4_monthly_df.empty:
-        sheets_filtered = filter_media_urls(load_google_sheet_data(), config['domain'])
-        merged_monthly = merge_sheets_with_ga4(sheets_filtered, ga4_monthly_df, config['domain'])
-        if not merged_monthly.empty and 'screenPageViews' in merged_monthly.columns:
-            total_monthly_pageviews = merged_monthly['screenPageViews'].sum()
-
-    current_progress = total_monthly_pageviews
+    current_progress = data.monthly_pageviews
     daily_average = current_progress / days_in_month if days_in_month > 0 else 0
     projected_monthly = daily_average * days_total_month
 
@@ -332,20 +427,13 @@ def _render_progression_section(config, merged_df, credentials_file):
             help="Estimación de Page Views al final del mes según tendencia actual"
         )
 
-    # Cargar datos históricos del mes actual para mostrar progresión
-    with st.spinner("Cargando progresión del mes..."):
-        hist_start_date = current_date.replace(day=1)
-        hist_end_date = current_date
-
-        historical_df = get_ga4_historical_data(
-            config['property_id'],
-            credentials_file,
-            hist_start_date,
-            hist_end_date,
-            "day",
-            sheets_urls,
-            config['domain']
-        )
+    # Progresión del mes: se arma localmente a partir del reporte mensual pagePath x date
+    historical_df = build_historical_data(
+        data.ga4_monthly_df,
+        data.sheets_url_index,
+        config['domain'],
+        "day"
+    )
 
     if historical_df is not None and not historical_df.empty:
         # Agrupar por día y sumar pageviews
@@ -393,30 +481,33 @@ def _render_progression_section(config, merged_df, credentials_file):
         st.warning("No se pudieron cargar los datos de progresión del mes")
 
 
-def _render_author_performance(config, merged_df):
+@st.fragment
+def _render_author_performance(config, data):
     """Renderizar sección de performance por autor (solo para redacción)"""
     if config['page_type'] != 'redaccion':
         return
 
+    merged_df = data.merged_df
+
     st.markdown("---")
     st.markdown("##  Performance por Autor | Mes en curso")
 
     if not merged_df.empty and 'autor' in merged_df.columns and 'screenPageViews' in merged_df.columns:
-        # Filtrar datos del mes actual
-        merged_df_monthly = merged_df.copy()
+        # Filtrar datos del mes actual (datePub ya viene como datetime)
+        merged_df_monthly = merged_df
         if 'datePub' in merged_df_monthly.columns:
-            merged_df_monthly['datePub_dt'] = pd.to_datetime(merged_df_monthly['datePub'], format='%d/%m/%Y', errors='coerce')
-            current_month = datetime.now().month
-            current_year = datetime.now().year
+            current_date = ga4_property_now(config['property_id'])
+            current_month = current_date.month
+            current_year = current_date.year
             merged_df_monthly = merged_df_monthly[
-                (merged_df_monthly['datePub_dt'].dt.month == current_month) &
-                (merged_df_monthly['datePub_dt'].dt.year == current_year)
+                (merged_df_monthly['datePub'].dt.month == current_month) &
+                (merged_df_monthly['datePub'].dt.year == current_year)
             ]
 
         # Agrupar por autor y sumar pageviews del mes actual
-        author_performance = merged_df_monthly.groupby('autor').agg({
+        author_performance = merged_df_monthly.groupby('autor', observed=True).agg({
             'screenPageViews': 'sum',
-            'url_normalized': 'count'
+            'url_id': 'count'
         }).reset_index()
 
         author_performance.columns = ['Autor', 'Total Page Views', 'Cantidad de Artículos']
@@ -472,8 +563,8 @@ def _render_author_performance(config, merged_df):
         with col2:
             # Selector de fecha inicial
             if 'datePub' in merged_df.columns:
-                min_date = pd.to_datetime(merged_df['datePub'], format='%d/%m/%Y', errors='coerce').min().date()
-                max_date = pd.to_datetime(merged_df['datePub'], format='%d/%m/%Y', errors='coerce').max().date()
+                min_date = merged_df['datePub'].min().date()
+                max_date = merged_df['datePub'].max().date()
             else:
                 min_date = datetime.now().date() - timedelta(days=30)
                 max_date = datetime.now().date()
@@ -509,7 +600,6 @@ def _render_author_performance(config, merged_df):
             author_data = merged_df[merged_df['autor'].isin(selected_authors)].copy()
 
             if 'datePub' in author_data.columns:
-                author_data['datePub'] = pd.to_datetime(author_data['datePub'], format='%d/%m/%Y', errors='coerce')
                 author_data = author_data[
                     (author_data['datePub'].dt.date >= start_date) &
                     (author_data['datePub'].dt.date <= end_date)
@@ -540,10 +630,10 @@ def _render_author_performance(config, merged_df):
                         colors = [config['color'], '#ff6b6b', '#4ecdc4', '#45b7d1', '#f9ca24', '#6c5ce7', '#a29bfe', '#fd79a8', '#fdcb6e']
 
                         for idx, author in enumerate(selected_authors):
-                            author_specific_data = author_data[author_data['autor'] == author].copy()
+                            author_specific_data = author_data[author_data['autor'] == author]
                             daily_performance = author_specific_data.groupby(author_specific_data['datePub'].dt.date).agg({
                                 'screenPageViews': 'sum',
-                                'url_normalized': 'count'
+                                'url_id': 'count'
                             }).reset_index()
                             daily_performance.columns = ['Fecha', 'Page Views', 'Artículos']
                             daily_performance = daily_performance.sort_values('Fecha')
@@ -575,9 +665,9 @@ def _render_author_performance(config, merged_df):
                         author_data['month_year'] = author_data['datePub'].dt.to_period('M').astype(str)
 
                         # Agrupar por autor y mes
-                        monthly_performance = author_data.groupby(['autor', 'month_year']).agg({
+                        monthly_performance = author_data.groupby(['autor', 'month_year'], observed=True).agg({
                             'screenPageViews': 'sum',
-                            'url_normalized': 'count'
+                            'url_id': 'count'
                         }).reset_index()
                         monthly_performance.columns = ['Autor', 'Mes', 'Page Views', 'Artículos']
 
@@ -611,23 +701,26 @@ def _render_author_performance(config, merged_df):
 
                 # Tabla de artículos individuales
                 st.markdown("#### Artículos en el Período")
-                display_cols = ['datePub', 'autor', 'titulo', 'screenPageViews'] if 'titulo' in author_data.columns else ['datePub', 'autor', 'url_normalized', 'screenPageViews']
+                display_cols = ['datePub', 'autor', 'titulo', 'screenPageViews'] if 'titulo' in author_data.columns else ['datePub', 'autor', 'url_id', 'screenPageViews']
                 author_articles = author_data[display_cols].sort_values('screenPageViews', ascending=False)
+                if 'url_id' in author_articles.columns:
+                    author_articles['url_id'] = decode_urls(author_articles['url_id'])
 
                 # Renombrar columnas
                 rename_dict = {
                     'datePub': 'Fecha',
                     'autor': 'Autor',
                     'titulo': 'Título',
-                    'url_normalized': 'URL',
+                    'url_id': 'URL',
                     'screenPageViews': 'Page Views'
                 }
                 author_articles = author_articles.rename(columns={k: v for k, v in rename_dict.items() if k in author_articles.columns})
 
                 st.dataframe(
                     author_articles.style.format({
+                        'Fecha': '{:%d/%m/%Y}',
                         'Page Views': '{:,.0f}'
-                    }),
+                    }, na_rep=''),
                     use_container_width=True,
                     hide_index=True
                 )
@@ -639,10 +732,14 @@ def _render_author_performance(config, merged_df):
         st.info("No hay datos de autores disponibles")
 
 
-def _render_top_urls(config, merged_df, start_date_param, end_date_param):
+@st.fragment
+def _render_top_urls(config, data):
     """Renderizar sección de top URLs"""
     st.markdown("---")
 
+    merged_df = data.merged_df
+    start_date_param, end_date_param = data.date_range
+
     is_redaccion = config['page_type'] == 'redaccion'
     icon_prefix = " " if is_redaccion else ""
 
@@ -659,16 +756,17 @@ def _render_top_urls(config, merged_df, start_date_param, end_date_param):
         display_columns = []
         if 'titulo' in merged_df.columns:
             display_columns.append('titulo')
-        display_columns.extend(['url_normalized', 'screenPageViews'])
+        display_columns.extend(['url_id', 'screenPageViews'])
         if 'autor' in merged_df.columns and is_redaccion:
             display_columns.append('autor')
 
         top_urls = merged_df.nlargest(top_n, 'screenPageViews')[display_columns].copy()
+        top_urls['url_id'] = decode_urls(top_urls['url_id'])
 
         # Renombrar columnas
         column_rename = {
             'titulo': 'Título',
-            'url_normalized': 'URL',
+            'url_id': 'URL',
             'screenPageViews': 'Page Views',
             'autor': 'Autor'
         }
@@ -703,7 +801,8 @@ def _render_top_urls(config, merged_df, start_date_param, end_date_param):
         st.warning("No hay datos de Page Views disponibles")
 
 
-def _render_domain_comparison(config, sheets_filtered, ga4_df, merged_df, credentials_file):
+@st.fragment
+def _render_domain_comparison(config, data):
     """Renderizar sección de comparativa dominio vs sheet"""
     st.markdown("---")
 
@@ -715,10 +814,7 @@ def _render_domain_comparison(config, sheets_filtered, ga4_df, merged_df, creden
     if is_redaccion:
         st.caption(f"Período de análisis: Mes en curso")
         # Obtener datos del mes en curso
-        current_month_start_comp = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-        current_month_today_comp = datetime.now().strftime('%Y-%m-%d')
-        comparison_start_param = current_month_start_comp
-        comparison_end_param = current_month_today_comp
+        comparison_start_param, comparison_end_param = _current_month_range(config)
     else:
         # Selectores de tiempo para la comparativa
         col1, col2 = st.columns([1, 3])
@@ -762,30 +858,29 @@ def _render_domain_comparison(config, sheets_filtered, ga4_df, merged_df, creden
         # Convertir el período al formato adecuado si es necesario
         if comparison_start_param.endswith("daysAgo"):
             days = int(comparison_start_param.replace("daysAgo", ""))
-            period_start = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+            period_start = (ga4_property_now(config['property_id']) - timedelta(days=days)).strftime('%Y-%m-%d')
         else:
             period_start = comparison_start_param
 
         if comparison_end_param == "today":
-            period_end = datetime.now().strftime('%Y-%m-%d')
+            period_end = ga4_property_now(config['property_id']).strftime('%Y-%m-%d')
         else:
             period_end = comparison_end_param
 
         st.caption(f"Período de análisis: {period_start} a {period_end}")
 
-    # Cargar datos de GA4 para la comparativa
-    with st.spinner('Cargando datos de comparativa...'):
-        ga4_comparison_df = get_ga4_data(
-            config['property_id'],
-            credentials_file,
-            start_date=comparison_start_param,
-            end_date=comparison_end_param
-        )
+    # Datos de GA4 para la comparativa (ya planificados junto con el resto de secciones)
+    comparison_range = (comparison_start_param, comparison_end_param)
+    if comparison_range in data.ga4_frames:
+        ga4_comparison_df = data.ga4_frame(comparison_range)
+    else:
+        with st.spinner('Cargando datos de comparativa...'):
+            ga4_comparison_df = data.ga4_frame(comparison_range)
 
     # Usar los datos de GA4 de la comparativa
     if ga4_comparison_df is not None and not ga4_comparison_df.empty:
         # Mergear datos del Sheet con GA4 del período seleccionado
-        merged_comparison_df = merge_sheets_with_ga4(sheets_filtered, ga4_comparison_df, config['domain'])
+        merged_comparison_df = data.merged(comparison_range)
 
         # Calcular métricas del dominio completo
         domain_total_pv = ga4_comparison_df['screenPageViews'].sum()
@@ -877,7 +972,8 @@ def _render_domain_comparison(config, sheets_filtered, ga4_df, merged_df, creden
         st.error("No se pudieron obtener los datos comparativos")
 
 
-def _render_growth_analysis(config, merged_df, credentials_file):
+@st.fragment
+def _render_growth_analysis(config, data):
     """Renderizar sección de análisis de crecimiento"""
     st.markdown("---")
 
@@ -904,9 +1000,7 @@ def _render_growth_analysis(config, merged_df, credentials_file):
         )
 
     # Obtener URLs normalizadas del Sheet para filtrar
-    sheets_urls_growth = None
-    if not merged_df.empty and 'url_normalized' in merged_df.columns:
-        sheets_urls_growth = merged_df['url_normalized'].dropna().unique().tolist()
+    sheets_urls_growth = data.sheets_urls_handle
 
     # Si es personalizado, mostrar selectores de fecha
     if comparison_type == "custom":
@@ -943,20 +1037,22 @@ def _render_growth_analysis(config, merged_df, credentials_file):
         # Obtener datos personalizados
         growth_data = get_ga4_growth_data_custom(
             config['property_id'],
-            credentials_file,
+            data.credentials_file,
             current_start,
             current_end,
             previous_start,
             previous_end,
-            sheets_urls_growth
+            sheets_urls_growth,
+            config['domain']
         )
     else:
         # Obtener datos predefinidos
         growth_data = get_ga4_growth_data(
             config['property_id'],
-            credentials_file,
+            data.credentials_file,
             comparison_type,
-            sheets_urls_growth
+            sheets_urls_growth,
+            config['domain']
         )
 
     if growth_data:
@@ -1040,6 +1136,42 @@ def _render_growth_analysis(config, merged_df, credentials_file):
         st.error(f"{icon_prefix}No se pudieron obtener los datos de crecimiento")
 
 
+def _render_admin_panel(config):
+    """Panel de administración (solo usuario admin): estado y control del precalentamiento"""
+    with st.expander("🔥 Precalentamiento de datos"):
+        st.caption("Precarga en segundo plano los datos por defecto de cada dashboard para que el primer acceso no espere a GA4 ni al Sheet.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Iniciar precalentamiento", key=f"warmup_start_{config['medio']}"):
+                start_warmup_scheduler(force=True)
+        with col2:
+            if st.button("Detener precalentamiento", key=f"warmup_stop_{config['medio']}"):
+                stop_warmup_scheduler()
+
+        warmup_status = get_warmup_status()
+        if warmup_status['running']:
+            next_run = warmup_status['next_run']
+            st.success(f"Activo. Próxima pasada: {next_run:%H:%M:%S}" if next_run else "Activo. Primera pasada en curso.")
+        elif warmup_status['disabled']:
+            st.warning("Detenido por un operador. Los dashboards no lo reinician hasta que se vuelva a iniciar.")
+        else:
+            st.warning("Detenido")
+
+        if warmup_status['medios']:
+            warmup_rows = [
+                {
+                    'Medio': medio,
+                    'Última ejecución': status['last_run'].strftime('%d/%m/%Y %H:%M:%S'),
+                    'Hace (min)': round((datetime.now() - status['last_run']).total_seconds() / 60, 1),
+                    'Duración (s)': round(status['duration'], 1),
+                    'Error': status['error'] or ''
+                }
+                for medio, status in warmup_status['medios'].items()
+            ]
+            st.dataframe(pd.DataFrame(warmup_rows), use_container_width=True, hide_index=True)
+
+
 def render_dashboard(config):
     """
     Renderizar dashboard completo según configuración.
@@ -1065,6 +1197,10 @@ def render_dashboard(config):
     # Verificar autenticación
     _check_authentication(config)
 
+    # Precalentamiento de todos los dashboards en segundo plano (una vez por proceso,
+    # salvo que un operador lo haya detenido desde el panel de administración)
+    start_warmup_scheduler()
+
     # Obtener configuración del medio desde utils
     media_config = create_media_config()[config['medio']]
 
@@ -1075,6 +1211,8 @@ def render_dashboard(config):
         config['property_id'] = media_config['property_id']
     if 'domain' not in config:
         config['domain'] = media_config['domain']
+    if 'credentials_file' not in config and 'credentials_file' in media_config:
+        config['credentials_file'] = media_config['credentials_file']
 
     # Título
     st.title(f"{media_config['name']}")
@@ -1088,8 +1226,12 @@ def render_dashboard(config):
     # Sidebar con opciones
     start_date_param, end_date_param = _render_sidebar_config(config)
 
-    # Cargar datos
-    sheets_filtered, ga4_df, credentials_file = _load_data(config, start_date_param, end_date_param)
+    # Datos compartidos por todas las secciones en este rerun
+    reset_served_data_age()
+    data = _DashboardData(config, (start_date_param, end_date_param))
+    with st.spinner('Cargando datos...'):
+        sheets_filtered = data.sheets_filtered
+        ga4_df = data.ga4_df
 
     # Verificar si hay datos
     if sheets_filtered.empty and (ga4_df is None or ga4_df.empty):
@@ -1111,43 +1253,24 @@ def render_dashboard(config):
 
         # Mergear datos si ambos están disponibles
         if not sheets_filtered.empty and ga4_df is not None and not ga4_df.empty:
-            merged_df = merge_sheets_with_ga4(sheets_filtered, ga4_df, config['domain'])
-
-            # Calcular pageviews del mes actual
-            current_month_start = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-            current_month_today = datetime.now().strftime('%Y-%m-%d')
-
-            ga4_monthly_df = get_ga4_data(
-                config['property_id'],
-                credentials_file,
-                start_date=current_month_start,
-                end_date=current_month_today
-            )
-
-            total_monthly_pageviews = 0
-            if ga4_monthly_df is not None and not ga4_monthly_df.empty and not sheets_filtered.empty:
-                merged_monthly = merge_sheets_with_ga4(sheets_filtered, ga4_monthly_df, config['domain'])
-                if not merged_monthly.empty and 'screenPageViews' in merged_monthly.columns:
-                    total_monthly_pageviews = merged_monthly['screenPageViews'].sum()
-
             # ==================== SECCIÓN 1: GAUGE ====================
-            _render_gauge_section(config, total_monthly_pageviews)
+            _render_gauge_section(config, data)
             st.markdown("---")
 
             # ==================== SECCIÓN 2: PROGRESIÓN ====================
-            _render_progression_section(config, merged_df, credentials_file)
+            _render_progression_section(config, data)
 
             # ==================== SECCIÓN 3: PERFORMANCE POR AUTOR (solo redacción) ====================
-            _render_author_performance(config, merged_df)
+            _render_author_performance(config, data)
 
             # ==================== SECCIÓN 4: TOP URLS ====================
-            _render_top_urls(config, merged_df, start_date_param, end_date_param)
+            _render_top_urls(config, data)
 
             # ==================== SECCIÓN 5: COMPARATIVA DOMINIO VS SHEET ====================
-            _render_domain_comparison(config, sheets_filtered, ga4_df, merged_df, credentials_file)
+            _render_domain_comparison(config, data)
 
             # ==================== SECCIÓN 6: CRECIMIENTO ====================
-            _render_growth_analysis(config, merged_df, credentials_file)
+            _render_growth_analysis(config, data)
 
         elif ga4_df is not None and not ga4_df.empty:
             # Solo datos de GA4
@@ -1179,4 +1302,10 @@ def render_dashboard(config):
     # Footer
     st.markdown("---")
     icon_prefix = " " if config['page_type'] == 'redaccion' else ""
-    st.caption(f"{icon_prefix}Dashboard de {media_config['name']} | Property ID: {config['property_id']} | Dominio: {config['domain']}")
+    data_age_minutes = int(get_served_data_age() // 60)
+    data_age = f"Datos de hace {data_age_minutes} min" if data_age_minutes else "Datos actualizados"
+    st.caption(f"{icon_prefix}Dashboard de {media_config['name']} | Property ID: {config['property_id']} | Dominio: {config['domain']} | {data_age}")
+
+    # Administración (el usuario admin entra a todos los dashboards)
+    if st.session_state.get(f"current_user_{config['medio']}") == 'admin':
+        _render_admin_panel(config)
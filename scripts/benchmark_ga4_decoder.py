@@ -0,0 +1,119 @@
+"""
+Benchmark del decodificador de respuestas runReport de GA4.
+
+Compara el loop original (un dict por fila + try/except por celda) contra el
+decodificador columnar de utils.py sobre respuestas sintéticas pagePath x date.
+
+Uso:
+    python scripts/benchmark_ga4_decoder.py [filas ...]
+"""
+
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import _decode_ga4_page, _ga4_pages_to_dataframe
+
+METRICS = [
+    ('sessions', 'TYPE_INTEGER'),
+    ('totalUsers', 'TYPE_INTEGER'),
+    ('screenPageViews', 'TYPE_INTEGER'),
+    ('averageSessionDuration', 'TYPE_SECONDS'),
+    ('bounceRate', 'TYPE_FLOAT'),
+    ('newUsers', 'TYPE_INTEGER'),
+    ('engagementRate', 'TYPE_FLOAT')
+]
+
+
+def build_response(n_rows, seed=0):
+    """Arma una respuesta runReport sintética de n_rows filas pagePath x date"""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        rows.append({
+            'dimensionValues': [
+                {'value': f"/seccion/nota-{i // 90}.html"},
+                {'value': f"2025{(i % 90) // 28 + 1:02d}{i % 28 + 1:02d}"}
+            ],
+            'metricValues': [
+                {'value': str(rnd.randint(0, 5000))} if metric_type == 'TYPE_INTEGER'
+                else {'value': repr(rnd.random() * 100)}
+                for _, metric_type in METRICS
+            ]
+        })
+    return {
+        'dimensionHeaders': [{'name': 'pagePath'}, {'name': 'date'}],
+        'metricHeaders': [{'name': name, 'type': metric_type} for name, metric_type in METRICS],
+        'rows': rows,
+        'rowCount': n_rows
+    }
+
+
+def legacy_decode(response):
+    """Loop original de get_ga4_data"""
+    data = []
+    if 'rows' in response:
+        for row in response['rows']:
+            row_data = {}
+            for i, dimension in enumerate(response['dimensionHeaders']):
+                row_data[dimension['name']] = row['dimensionValues'][i]['value']
+            for i, metric in enumerate(response['metricHeaders']):
+                value = row['metricValues'][i]['value']
+                try:
+                    if '.' in value:
+                        row_data[metric['name']] = float(value)
+                    else:
+                        row_data[metric['name']] = int(value)
+                except:
+                    row_data[metric['name']] = value
+            data.append(row_data)
+
+    df = pd.DataFrame(data)
+    df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
+    return df
+
+
+def columnar_decode(response):
+    """Decodificador columnar de utils.py"""
+    return _ga4_pages_to_dataframe(response, [_decode_ga4_page(response)])
+
+
+def best_of(func, response, repeat):
+    """Mejor tiempo de repeat ejecuciones"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(response)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+
+    for n_rows in sizes:
+        response = build_response(n_rows)
+        repeat = 3 if n_rows <= 100000 else 1
+
+        legacy_time, legacy_df = best_of(legacy_decode, response, repeat)
+        columnar_time, columnar_df = best_of(columnar_decode, response, repeat)
+
+        # Mismos valores que el loop original
+        pd.testing.assert_frame_equal(
+            legacy_df, columnar_df, check_dtype=False
+        )
+
+        print(
+            f"{n_rows:>9,} filas | loop: {legacy_time:6.2f}s | columnar: {columnar_time:6.2f}s "
+            f"| x{legacy_time / columnar_time:.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Verificación y benchmark de normalize_url_series.
+
+Comprueba que la versión vectorizada da exactamente lo mismo que
+normalize_url (fila por fila) sobre un corpus de casos borde más URLs
+sintéticas, y compara tiempos contra el .apply/.map original: en frío
+(LRU de normalizaciones vacío) y con el LRU ya cargado.
+
+Uso:
+    python scripts/benchmark_normalize_url.py [filas ...]
+"""
+
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import normalize_url, normalize_url_series, _normalize_url_values, _URL_NORMALIZATION_CACHE
+
+# Casos borde: protocolo, www, dominio okdiario, AMP, query, fragmentos, barras, vacíos
+FIXTURE_URLS = [
+    "https://www.okdiario.com/espana/nota-123.html",
+    "http://okdiario.com/espana/nota-123.html/amp",
+    "okdiario.com/espana/nota-123.html/amp/",
+    "https://www.clarin.com/politica/nota_0_abc.html?utm_source=twitter#comentarios",
+    "HTTPS://WWW.CLARIN.COM/Politica/Nota.HTML",
+    "  https://www.ole.com.ar/futbol/nota.html  ",
+    "www.elespanol.com//opinion///columna.amp",
+    "www.elespanol.com/opinion/columna.amp/",
+    "/seccion/nota.amp/amp",
+    "/seccion/nota/amp.amp",
+    "/seccion/nota.html#top?x=1",
+    "/seccion/nota.html?x=1#top",
+    "/",
+    "//",
+    "",
+    "#solo-fragmento",
+    "?solo=query",
+    "amp",
+    "/amp",
+    ".amp",
+    "https://",
+    "https://www.",
+    "okdiario.com",
+    "okdiario.com/",
+    "wwww.clarin.com/x",
+    "https://www.nationalgeographic.com.es/historia/nota_1234",
+    None,
+    np.nan,
+]
+
+DOMAINS = ["clarin.com", "okdiario.com", "ole.com.ar", "nationalgeographic"]
+
+TOKENS = [
+    "https://", "http://", "www.", "okdiario.com", "clarin.com", "/", "//", "/amp", ".amp", "/amp/",
+    "?utm=1", "#frag", "nota-", "SECCION", "index.html", "-", "_", ".html", "amp", "%20"
+]
+
+
+def synthetic_urls(n_rows, seed=0):
+    """URLs sintéticas combinando tokens al azar (para fuzzing de la equivalencia)"""
+    rnd = random.Random(seed)
+    return [''.join(rnd.choice(TOKENS) for _ in range(rnd.randint(1, 8))) for _ in range(n_rows)]
+
+
+def ga4_page_paths(n_rows, seed=0):
+    """pagePaths con la forma de un reporte pagePath x date (cada path se repite por día)"""
+    rnd = random.Random(seed)
+    n_paths = max(1, n_rows // 90)
+    paths = [
+        f"/{rnd.choice(['politica', 'deportes', 'sociedad'])}/nota-{i}.html" + rnd.choice(['', '/amp', '?utm_source=x', '/'])
+        for i in range(n_paths)
+    ]
+    return [paths[i % n_paths] for i in range(n_rows)]
+
+
+def check_equivalence():
+    """normalize_url_series == normalize_url fila por fila, con y sin dominio"""
+    urls = pd.Series(FIXTURE_URLS + synthetic_urls(20000), dtype=object)
+
+    expected = urls.map(normalize_url)
+    for result in (_normalize_url_values(urls), normalize_url_series(urls), normalize_url_series(urls)):
+        mismatches = (expected != result).sum()
+        assert mismatches == 0, urls[expected != result].head(10).tolist()
+
+    page_paths = urls.dropna()
+    for domain in DOMAINS:
+        expected = page_paths.map(lambda x: normalize_url(f"{domain}{x}"))
+        # Sin caché, en frío y con el LRU cargado
+        for result in (_normalize_url_values(page_paths, domain), normalize_url_series(page_paths, domain),
+                       normalize_url_series(page_paths, domain)):
+            assert (expected == result).all(), page_paths[expected != result].head(10).tolist()
+
+    print(f"Equivalencia OK: {len(urls):,} URLs, {len(DOMAINS)} dominios")
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    check_equivalence()
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100000, 1000000]
+    for n_rows in sizes:
+        page_paths = pd.Series(ga4_page_paths(n_rows))
+        repeat = 3 if n_rows <= 100000 else 1
+
+        def cold():
+            _URL_NORMALIZATION_CACHE.clear()
+            normalize_url_series(page_paths, "clarin.com")
+
+        scalar_time = best_of(lambda: page_paths.map(lambda x: normalize_url(f"clarin.com{x}")), repeat)
+        vectorized_time = best_of(lambda: _normalize_url_values(page_paths, "clarin.com"), repeat)
+        cold_time = best_of(cold, repeat)
+        warm_time = best_of(lambda: normalize_url_series(page_paths, "clarin.com"), repeat)
+
+        print(
+            f"{n_rows:>9,} filas | normalize_url: {scalar_time:6.2f}s | vectorizada: {vectorized_time:6.2f}s "
+            f"| únicos (frío): {cold_time:6.2f}s | únicos (LRU): {warm_time:6.2f}s "
+            f"| x{scalar_time / cold_time:.0f} / x{scalar_time / warm_time:.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
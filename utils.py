@@ -1,4 +1,5 @@
 import re
+import numpy as np
 import pandas as pd
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
@@ -8,9 +9,111 @@ import logging
 import base64
 import pickle
 import json
+import os
+import hashlib
+import tempfile
+import threading
+import functools
+import itertools
+import inspect
+import copy
+import time
+from collections import OrderedDict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Filas por página en runReport (la API admite hasta 250000 por request)
+GA4_PAGE_SIZE = 100000
+# Máximo de requests runReport en curso por propiedad (páginas y chunks del pushdown juntos)
+GA4_MAX_IN_FLIGHT_PAGES = 4
+# Enviar las URLs del Sheet a GA4 como filtro de pagePath en lugar de bajar toda la propiedad
+GA4_SHEET_FILTER_PUSHDOWN = True
+# Valores por inListFilter en cada request del pushdown
+GA4_PUSHDOWN_CHUNK_SIZE = 1000
+# pagePaths que normalize_url puede colapsar de formas que no se enumeran como
+# candidatos (barras dobles, query o fragmento, espacios): el pushdown los pide
+# aparte con este regex (sintaxis RE2 de GA4) y se filtran localmente
+GA4_PUSHDOWN_IRREGULAR_PATH_RE = r'//|[?#]|[\s\x0b\x1c-\x1f\x85\p{Z}]'
+# Zona horaria de una propiedad GA4 cuyo medio no define 'timezone' en create_media_config.
+# GA4 corta los días en la zona de la propiedad: 'today', 'NdaysAgo' y los días
+# cerrados se calculan en esa zona, no con el reloj del servidor
+GA4_DEFAULT_TIMEZONE = os.environ.get('DASHBOARD_GA4_TIMEZONE', 'America/Argentina/Buenos_Aires')
+# Horas tras el fin de un día a partir de las cuales GA4 ya no lo modifica
+GA4_CLOSED_DAY_LAG_HOURS = 48
+# Segundos que vale una partición diaria que todavía puede cambiar (hoy / ayer)
+GA4_OPEN_DAY_TTL = 300
+# Antigüedad máxima de una partición abierta vencida que se sirve mientras se refresca en segundo plano
+GA4_OPEN_DAY_MAX_STALE = 3600
+# Dimensiones de baja cardinalidad que se decodifican como category
+GA4_CATEGORY_DIMENSIONS = {'country', 'dateRange', 'deviceCategory', 'sessionDefaultChannelGroup'}
+
+# Caché persistente en disco (Parquet + manifest) que sobrevive a reinicios del proceso
+DISK_CACHE_ENABLED = True
+DISK_CACHE_DIR = os.environ.get(
+    'DASHBOARD_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+)
+# Tamaño máximo en disco; al superarlo se eliminan las entradas usadas hace más tiempo
+DISK_CACHE_MAX_BYTES = int(os.environ.get('DASHBOARD_DISK_CACHE_MB', 512)) * 1024 * 1024
+# Entradas que nunca se eliminan por tamaño: la copia del Sheet es la base de la
+# sincronización incremental y perderla obliga a bajarlo completo
+DISK_CACHE_PINNED_KEYS = {'sheets/main'}
+# Cambiar al modificar el formato de lo que se guarda: invalida todo el caché en disco
+DISK_CACHE_SCHEMA_VERSION = 2
+# Segundos que vale la copia del Google Sheet
+SHEET_CACHE_TTL = 300
+# Sincronización incremental del Sheet: cada cuánto (segundos) se vuelve a bajar
+# completo para tomar ediciones de filas viejas, y cuántas filas del final se
+# comparan por hash para detectar cambios fuera de lo agregado
+SHEET_FULL_SYNC_INTERVAL = 3600
+SHEET_SYNC_TAIL_ROWS = 20
+# Esquema del Google Sheet: columna -> tipo ('datetime' o 'category'). Las
+# columnas con 'date' o 'fecha' en el nombre también se leen como fechas; el
+# resto queda como texto. El formato dd/mm/yyyy se aplica solo al mostrar
+SHEET_SCHEMA = {
+    'datePub': 'datetime',
+    'fecha_publicacion': 'datetime',
+    'fecha': 'datetime',
+    'date': 'datetime',
+    'autor': 'category',
+}
+# Columnas del Sheet que usan los dashboards además de las de SHEET_SCHEMA:
+# la API solo baja estas (y las de fecha)
+SHEET_COLUMNS = ['url', 'URL', 'link', 'Link', 'enlace', 'Enlace', 'titulo']
+# Día 0 de los seriales de fecha de Google Sheets
+SHEET_SERIAL_EPOCH = pd.Timestamp('1899-12-30')
+# Antigüedad máxima de una entrada vencida de los loaders que se sirve mientras se refresca
+# en segundo plano (stale-while-revalidate); pasado ese límite la lectura espera al refresh
+LOADER_MAX_STALE = 3600
+# Memoria máxima de los cachés en proceso (loaders + particiones GA4); al superarla
+# se descartan las entradas usadas hace más tiempo (las particiones siguen en disco)
+MEMORY_CACHE_MAX_BYTES = int(os.environ.get('DASHBOARD_MEMORY_CACHE_MB', 1024)) * 1024 * 1024
+# Pares (dominio, URL cruda) -> URL normalizada que se recuerdan entre llamadas
+URL_NORMALIZATION_CACHE_SIZE = 500000
+# Conjuntos de URLs del Sheet registrados (los más viejos se descartan al superar el límite)
+URL_SET_REGISTRY_SIZE = 256
+# Segundos mínimos entre dos invalidaciones ("Actualizar datos") de una misma propiedad
+CACHE_REFRESH_COOLDOWN = 60
+
+# Precalentamiento en segundo plano de los datos por defecto de cada dashboard
+WARMUP_ENABLED = os.environ.get('DASHBOARD_WARMUP', '1') == '1'
+# Segundos entre dos pasadas completas por todos los medios
+WARMUP_INTERVAL = int(os.environ.get('DASHBOARD_WARMUP_INTERVAL', 900))
+# Segundos de espera entre un medio y el siguiente para repartir la cuota de GA4
+WARMUP_STAGGER = int(os.environ.get('DASHBOARD_WARMUP_STAGGER', 20))
+# Valores por defecto de los widgets de los dashboards (el precalentamiento pide lo mismo):
+# rango del sidebar, rango de la comparativa dominio vs Sheet de clientes y tipo de crecimiento
+DASHBOARD_DEFAULT_RANGE = ("7daysAgo", "today")
+DASHBOARD_DEFAULT_COMPARISON_RANGE = ("7daysAgo", "today")
+DASHBOARD_DEFAULT_GROWTH = "day"
+# Mismo archivo de credenciales que usan los dashboards por defecto (forma parte de la clave del caché)
+WARMUP_CREDENTIALS_FILE = 'credentials_analytics_acceso_medios.json'
+# Marca de "detenido por un operador": mientras exista, los dashboards no lo vuelven a
+# iniciar solos. Está en disco para sobrevivir a reinicios del proceso
+WARMUP_DISABLED_FLAG = os.path.join(DISK_CACHE_DIR, 'warmup_disabled')
+
 def format_growth_percentage(growth_pct, growth_absolute):
     """
     Formatea el porcentaje de crecimiento manejando valores infinitos
@@ -158,14 +261,28 @@ def create_ga4_client(creds_data):
         token=creds_data.get('token'),
         refresh_token=creds_data.get('refresh_token'),
         id_token=creds_data.get('id_token'),
-        token_uri=creds_data.get('token_uri'),
+        token_uri=creds_data.get('token_uri', 'https://oauth2.googleapis.com/token'),
         client_id=creds_data.get('client_id'),
         client_secret=creds_data.get('client_secret'),
         scopes=creds_data.get('scopes', ['https://www.googleapis.com/auth/analytics.readonly'])
     )
 
+    # httplib2 no es thread-safe: cada hilo ejecuta los requests con su propio
+    # transporte, todos compartiendo las mismas credenciales (y el token refrescado)
+    thread_local = threading.local()
+
+    def build_request(http, *args, **kwargs):
+        import httplib2
+        import google_auth_httplib2
+        from googleapiclient.http import HttpRequest
+
+        if not hasattr(thread_local, 'http'):
+            thread_local.http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+        return HttpRequest(thread_local.http, *args, **kwargs)
+
     # Construir cliente GA4 usando build() como en getAccesos()
-    ga4_client = build('analyticsdata', 'v1beta', credentials=creds)
+    ga4_client = build('analyticsdata', 'v1beta', credentials=creds, requestBuilder=build_request,
+                       cache_discovery=False)
     return ga4_client
 
 def normalize_url(url):
@@ -218,9 +335,92 @@ def normalize_url(url):
     return url_clean
 
 
+# Patrones de _normalize_url_values (mismas transformaciones que normalize_url, en menos pasadas)
+_URL_PREFIX_RE = r'^(?:https?://)?(?:www\.)?(?:okdiario\.com)?'
+_URL_FRAGMENT_QUERY_RE = re.compile(r'[#?].*', re.DOTALL)
+_URL_AMP_SUFFIX_RE = r'(?:\.amp/?)?(?:/amp/?)?$'
+
+def _normalize_url_values(urls, domain=None):
+    """
+    Canonicalización vectorizada de normalize_url (sin caché, ver normalize_url_series)
+    """
+    if domain:
+        invalid = pd.Series(False, index=urls.index)
+        url_clean = domain + urls.astype(str)
+    else:
+        invalid = urls.isna() | urls.eq('')
+        url_clean = urls.astype(str)
+    
+    url_clean = url_clean.str.lower().str.strip()
+    url_clean = url_clean.str.replace(_URL_PREFIX_RE, '', regex=True)
+    
+    # Si no empieza con /, agregarlo
+    url_clean = url_clean.where(url_clean.eq('') | url_clean.str.startswith('/'), '/' + url_clean)
+    
+    # Cortar en el primer # o ? (fragmento y query parameters)
+    url_clean = url_clean.str.replace(_URL_FRAGMENT_QUERY_RE, '', regex=True)
+    url_clean = url_clean.str.replace(_URL_AMP_SUFFIX_RE, '', regex=True)
+    url_clean = url_clean.str.replace(r'/+', '/', regex=True)
+    url_clean = url_clean.where(url_clean.eq('/'), url_clean.str.rstrip('/'))
+    url_clean = url_clean.mask(url_clean.eq(''), '/')
+    
+    return url_clean.mask(invalid, '')
+
+# Caché LRU de normalizaciones: (dominio, URL cruda) -> URL normalizada
+_URL_NORMALIZATION_CACHE = OrderedDict()
+_URL_NORMALIZATION_CACHE_LOCK = threading.Lock()
+
+def normalize_url_series(urls, domain=None):
+    """
+    Versión vectorizada de normalize_url para una Series completa.
+    
+    Aplica la misma canonicalización con operaciones de string de pandas
+    sobre toda la columna. Con domain, equivale a normalize_url(f"{domain}{x}")
+    (la forma en que se comparan los pagePath de GA4 con las URLs del Sheet).
+    
+    Cada valor distinto se normaliza una sola vez (factorize -> normalizar
+    los únicos -> take): en un reporte pagePath x date el mismo pagePath se
+    repite una vez por día. Los resultados quedan en un LRU del proceso de
+    URL_NORMALIZATION_CACHE_SIZE entradas que comparten todos los loaders.
+    
+    Args:
+        urls: Series de URLs o pagePaths
+        domain: Dominio a anteponer a cada valor (opcional)
+    
+    Returns:
+        Series de strings con el mismo índice
+    """
+    codes, uniques = pd.factorize(urls, use_na_sentinel=False)
+    uniques = list(uniques)
+    normalized = [None] * len(uniques)
+    
+    missing = []
+    with _URL_NORMALIZATION_CACHE_LOCK:
+        for i, raw in enumerate(uniques):
+            key = (domain, raw)
+            cached = _URL_NORMALIZATION_CACHE.get(key) if isinstance(raw, str) else None
+            if cached is None:
+                missing.append(i)
+            else:
+                _URL_NORMALIZATION_CACHE.move_to_end(key)
+                normalized[i] = cached
+    
+    if missing:
+        computed = _normalize_url_values(pd.Series([uniques[i] for i in missing], dtype=object), domain).tolist()
+        with _URL_NORMALIZATION_CACHE_LOCK:
+            for i, value in zip(missing, computed):
+                normalized[i] = value
+                if isinstance(uniques[i], str):
+                    _URL_NORMALIZATION_CACHE[(domain, uniques[i])] = value
+            while len(_URL_NORMALIZATION_CACHE) > URL_NORMALIZATION_CACHE_SIZE:
+                _URL_NORMALIZATION_CACHE.popitem(last=False)
+    
+    return pd.Series(np.array(normalized, dtype=object).take(codes), index=urls.index)
+
 def get_ga4_client_oauth(credentials_file=None, account_type="acceso"):
     """
     Crea un cliente de Google Analytics Data API v1beta usando OAuth2
+    Construye un cliente nuevo en cada llamada; usar get_ga4_client para el compartido
     """
     try:
         logger.info(f"Creando cliente GA4 OAuth con account_type: {account_type}")
@@ -256,26 +456,1341 @@ def get_ga4_client_oauth(credentials_file=None, account_type="acceso"):
         logger.error(f"Error creando cliente GA4 con OAuth2: {e}")
         return None
 
-@st.cache_data(ttl=300)
-def get_ga4_data_with_country(property_id, credentials_file, start_date="7daysAgo", end_date="today", country_filter=None):
+# Clientes GA4 compartidos por todo el proceso, uno por account_type
+_GA4_CLIENTS = {}
+_GA4_CLIENTS_LOCK = threading.Lock()
+
+def _resolve_ga4_account_type(property_id, credentials_file):
+    """
+    Determina qué tipo de cuenta usar según la propiedad
+    """
+    if property_id == "255037852":  # OK Diario usa acceso_medios
+        return "acceso_medios"
+    elif credentials_file == "damian_credentials_analytics_2025.json":  # Mundo Deportivo usa damian
+        return "damian"
+    else:  # Clarín y Olé usan acceso
+        return "acceso"
+
+def get_ga4_client(account_type="acceso"):
+    """
+    Devuelve el cliente GA4 del proceso para account_type.
+
+    El cliente (credenciales + documento de discovery) se construye una sola
+    vez por proceso y se comparte entre sesiones e hilos; los fallos no se
+    cachean para poder reintentar en la próxima llamada.
+    """
+    client = _GA4_CLIENTS.get(account_type)
+    if client is not None:
+        return client
+
+    with _GA4_CLIENTS_LOCK:
+        client = _GA4_CLIENTS.get(account_type)
+        if client is None:
+            client = get_ga4_client_oauth(account_type=account_type)
+            if client is not None:
+                _GA4_CLIENTS[account_type] = client
+    return client
+
+def _decode_ga4_page(response):
+    """
+    Extrae las columnas de una página de runReport (API v1beta).
+    Devuelve un dict nombre -> lista con los strings crudos, sin armar un dict por fila.
+    """
+    rows = response.get('rows', [])
+    columns = {}
+    for headers_key, values_key in (('dimensionHeaders', 'dimensionValues'), ('metricHeaders', 'metricValues')):
+        headers = response.get(headers_key, [])
+        if not headers:
+            continue
+        # Una sola pasada por todas las celdas y luego un slice con paso por header
+        values = [cell['value'] for row in rows for cell in row[values_key]]
+        for i, header in enumerate(headers):
+            columns[header['name']] = values[i::len(headers)]
+    return columns
+
+def _ga4_pages_to_dataframe(first_page, pages):
+    """
+    Une las columnas decodificadas de todas las páginas en un DataFrame tipado.
+
+    Los tipos salen de los headers de la respuesta: métricas TYPE_INTEGER como
+    int64 y el resto como float64, 'date' como datetime64 y las dimensiones de
+    GA4_CATEGORY_DIMENSIONS como category. Las métricas se parsean desde los
+    strings crudos con np.fromiter, sin arrays object intermedios ni
+    try/except por celda.
+    """
+    dimension_headers = first_page.get('dimensionHeaders', [])
+    metric_headers = first_page.get('metricHeaders', [])
+    
+    data = {}
+    for header in dimension_headers + metric_headers:
+        name = header['name']
+        chunks = [page[name] for page in pages if name in page]
+        data[name] = chunks[0] if len(chunks) == 1 else list(itertools.chain.from_iterable(chunks))
+    
+    for header in dimension_headers:
+        name = header['name']
+        if name == 'date':
+            # Pocas fechas distintas: parsear solo los valores únicos
+            codes, uniques = pd.factorize(np.array(data[name], dtype=object))
+            data[name] = pd.to_datetime(uniques, format='%Y%m%d').take(codes)
+        elif name in GA4_CATEGORY_DIMENSIONS:
+            data[name] = pd.Categorical(data[name])
+        else:
+            data[name] = np.array(data[name], dtype=object)
+    
+    for header in metric_headers:
+        name = header['name']
+        metric_type = header.get('type')
+        values = data[name]
+        try:
+            if metric_type == 'TYPE_INTEGER':
+                data[name] = np.fromiter(map(int, values), dtype=np.int64, count=len(values))
+            elif metric_type:
+                data[name] = np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+            else:
+                data[name] = pd.to_numeric(np.array(values, dtype=object))
+        except (TypeError, ValueError):
+            data[name] = pd.to_numeric(np.array(values, dtype=object), errors='coerce')
+    
+    return pd.DataFrame(data)
+
+# Llamadas en curso por clave: clave -> {'event', 'result', 'error'}
+_IN_FLIGHT = {}
+_IN_FLIGHT_LOCK = threading.Lock()
+
+def _single_flight(key, func):
+    """
+    Ejecuta func() una sola vez para todas las llamadas concurrentes con la
+    misma clave: la primera la ejecuta y las demás esperan y reciben su
+    resultado (o su excepción).
+    
+    Returns:
+        Tupla (resultado, leader) con leader=True para quien ejecutó func
+    """
+    with _IN_FLIGHT_LOCK:
+        call = _IN_FLIGHT.get(key)
+        leader = call is None
+        if leader:
+            call = {'event': threading.Event(), 'result': None, 'error': None}
+            _IN_FLIGHT[key] = call
+
+    if not leader:
+        call['event'].wait()
+        if call['error'] is not None:
+            raise call['error']
+        return call['result'], False
+
+    try:
+        call['result'] = func()
+    except Exception as e:
+        call['error'] = e
+        raise
+    finally:
+        with _IN_FLIGHT_LOCK:
+            del _IN_FLIGHT[key]
+        call['event'].set()
+    return call['result'], True
+
+# Cupos de requests runReport en curso por propiedad: property_id -> semáforo.
+# Los comparten todos los pools (páginas, chunks del pushdown, sesiones), así
+# que el tope de GA4_MAX_IN_FLIGHT_PAGES es global y no por pool
+_GA4_REQUEST_SLOTS = {}
+_GA4_REQUEST_SLOTS_LOCK = threading.Lock()
+
+def _execute_ga4_request(client, property_id, body):
+    """
+    Ejecuta un único runReport respetando el cupo de requests de la propiedad
+    """
+    with _GA4_REQUEST_SLOTS_LOCK:
+        slots = _GA4_REQUEST_SLOTS.get(property_id)
+        if slots is None:
+            slots = _GA4_REQUEST_SLOTS[property_id] = threading.BoundedSemaphore(GA4_MAX_IN_FLIGHT_PAGES)
+    with slots:
+        return client.properties().runReport(property=f"properties/{property_id}", body=body).execute()
+
+def run_ga4_report(client, property_id, request_body, page_size=None, max_in_flight=None):
+    """
+    Ejecuta un runReport paginando de forma transparente.
+
+    La primera página informa rowCount; las páginas restantes se piden en
+    paralelo (como máximo max_in_flight a la vez, y nunca más de
+    GA4_MAX_IN_FLIGHT_PAGES requests por propiedad sumando todos los
+    reportes en curso) y se unen en un único DataFrame respetando el orden
+    de los offsets.
+    
+    Los requests idénticos que llegan a la vez (p. ej. varias sesiones
+    abriendo el mismo dashboard) se resuelven con una sola ejecución.
+
+    Args:
+        client: Cliente GA4 (analyticsdata v1beta)
+        property_id: ID de la propiedad GA4
+        request_body: Body del runReport (se ignoran 'limit' y 'offset')
+        page_size: Filas por página (default GA4_PAGE_SIZE)
+        max_in_flight: Páginas simultáneas (default GA4_MAX_IN_FLIGHT_PAGES)
+
+    Returns:
+        DataFrame con todas las filas del reporte
+    """
+    page_size = page_size or GA4_PAGE_SIZE
+    key = ('runReport', property_id, json.dumps(request_body, sort_keys=True, default=str), page_size)
+    df, leader = _single_flight(
+        key, lambda: _execute_ga4_report(client, property_id, request_body, page_size, max_in_flight)
+    )
+    # Cada llamador que esperaba recibe su propia copia (ver _share_frame)
+    return df if leader else _share_frame(df)
+
+def _execute_ga4_report(client, property_id, request_body, page_size, max_in_flight):
+    """
+    Pide todas las páginas de un runReport (ver run_ga4_report)
+    """
+    max_in_flight = max_in_flight or GA4_MAX_IN_FLIGHT_PAGES
+
+    def page_body(offset):
+        body = dict(request_body)
+        body['limit'] = page_size
+        body['offset'] = offset
+        return body
+
+    first_page = _execute_ga4_request(client, property_id, page_body(0))
+    row_count = int(first_page.get('rowCount', 0))
+    offsets = list(range(page_size, row_count, page_size))
+
+    pages = [_decode_ga4_page(first_page)]
+    if offsets:
+        logger.info(f"GA4 property {property_id}: {row_count} filas, {len(offsets) + 1} páginas de {page_size}")
+
+        def fetch_page(offset):
+            return _decode_ga4_page(_execute_ga4_request(client, property_id, page_body(offset)))
+
+        # map() devuelve los resultados en el orden de los offsets
+        with ThreadPoolExecutor(max_workers=min(max_in_flight, len(offsets))) as executor:
+            pages.extend(executor.map(fetch_page, offsets))
+
+    if 'dimensionHeaders' not in first_page and 'metricHeaders' not in first_page:
+        return pd.DataFrame()
+    return _ga4_pages_to_dataframe(first_page, pages)
+
+# Sufijos que normalize_url quita del final de un pagePath "regular" (barras
+# simples, sin query ni espacios): barra final y versiones AMP
+_PAGE_PATH_SUFFIXES = ['', '/']
+_PAGE_PATH_SUFFIXES += [slash + amp for slash in _PAGE_PATH_SUFFIXES
+                        for amp in ('.amp', '.amp/', '/amp', '/amp/', '.amp/amp', '.amp/amp/')]
+
+def _is_irregular_page_path(path):
+    """
+    True si el pagePath cae en GA4_PUSHDOWN_IRREGULAR_PATH_RE (mismos
+    espacios que quita str.strip)
+    """
+    return '//' in path or '?' in path or '#' in path or any(char.isspace() for char in path)
+
+def sheet_urls_to_page_paths(sheets_urls, domain=None):
+    """
+    Reconstruye los pagePath candidatos de GA4 a partir de URLs normalizadas del Sheet.
+
+    Es la inversa de normalize_url(f"{domain}{pagePath}") para los pagePath
+    regulares (barras simples, sin query, fragmento ni espacios): quita el
+    prefijo del dominio normalizado y agrega las variantes que normalize_url
+    colapsa (barra final y versiones AMP; las mayúsculas las cubre el filtro
+    sin distinción de mayúsculas). Los pagePath irregulares no se enumeran:
+    los cubre GA4_PUSHDOWN_IRREGULAR_PATH_RE en run_ga4_report_pushdown.
+    Las URLs que no pueden corresponder a un pagePath del dominio se
+    descartan, ya que tampoco matchearían localmente.
+    """
+    prefix = normalize_url(domain) if domain else '/'
+    
+    candidates = set()
+    for url in sheets_urls:
+        if not url:
+            continue
+        if prefix == '/':
+            path = url
+        elif url == prefix:
+            path = '/'
+        elif url.startswith(prefix + '/'):
+            path = url[len(prefix):]
+        else:
+            continue
+        
+        body = '' if path == '/' else path
+        candidates.add(path)
+        candidates.update(body + suffix for suffix in _PAGE_PATH_SUFFIXES if (body + suffix).startswith('/'))
+    
+    return sorted(candidates)
+
+def run_ga4_report_pushdown(client, property_id, request_body, page_paths, chunk_size=None, max_in_flight=None):
+    """
+    Ejecuta un runReport filtrando pagePath en GA4 con inListFilter.
+
+    Los candidatos se parten en chunks de chunk_size valores y cada chunk se
+    pide en paralelo (paginado con run_ga4_report, bajo el mismo cupo de
+    requests por propiedad). Un request más trae los pagePath irregulares
+    (GA4_PUSHDOWN_IRREGULAR_PATH_RE), que normalize_url puede colapsar sobre
+    una URL del Sheet sin que figuren entre los candidatos. Como los filtros
+    son disjuntos (los candidatos son todos regulares), concatenar los
+    resultados no duplica filas.
+    
+    El resultado es un superconjunto de las filas del Sheet: hay que
+    filtrarlo localmente por URL normalizada, igual que el reporte completo.
+    """
+    chunk_size = chunk_size or GA4_PUSHDOWN_CHUNK_SIZE
+    max_in_flight = max_in_flight or GA4_MAX_IN_FLIGHT_PAGES
+    if not page_paths:
+        return pd.DataFrame()
+    
+    # Los candidatos irregulares ya los trae el request del regex
+    page_paths = [path for path in page_paths if not _is_irregular_page_path(path)]
+    filters = [
+        {'inListFilter': {'values': page_paths[i:i + chunk_size], 'caseSensitive': False}}
+        for i in range(0, len(page_paths), chunk_size)
+    ]
+    filters.append({'stringFilter': {
+        'matchType': 'PARTIAL_REGEXP',
+        'value': GA4_PUSHDOWN_IRREGULAR_PATH_RE,
+        'caseSensitive': False
+    }})
+    
+    def fetch_chunk(path_filter):
+        body = dict(request_body)
+        body['dimensionFilter'] = {'filter': dict(path_filter, fieldName='pagePath')}
+        return run_ga4_report(client, property_id, body)
+    
+    logger.info(f"GA4 property {property_id}: pushdown de {len(page_paths)} pagePaths en {len(filters)} requests")
+    with ThreadPoolExecutor(max_workers=min(max_in_flight, len(filters))) as executor:
+        frames = [frame for frame in executor.map(fetch_chunk, filters) if not frame.empty]
+    
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def _run_ga4_report_for_sheet(client, property_id, request_body, sheets_urls, domain=None, pushdown=None):
+    """
+    Ejecuta un reporte que luego se va a filtrar por URLs del Sheet, usando
+    pushdown a GA4 cuando está habilitado y los candidatos se pueden derivar
+    """
+    if pushdown is None:
+        pushdown = GA4_SHEET_FILTER_PUSHDOWN
+    
+    if pushdown and sheets_urls:
+        page_paths = get_sheet_url_index(sheets_urls).page_paths(domain)
+        if not page_paths:
+            return pd.DataFrame()
+        return run_ga4_report_pushdown(client, property_id, request_body, page_paths)
+    
+    return run_ga4_report(client, property_id, request_body)
+
+# ==================== CACHÉ EN DISCO ====================
+
+_DISK_MANIFEST = None
+_DISK_CACHE_LOCK = threading.Lock()
+
+def _disk_cache_path(name):
+    return os.path.join(DISK_CACHE_DIR, name)
+
+def _write_atomic(path, write):
+    """
+    Escribe un archivo de forma atómica: write(tmp_path) y luego os.replace
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _save_disk_manifest():
+    """
+    Persiste el manifest (debe llamarse con _DISK_CACHE_LOCK tomado)
+    """
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(_DISK_MANIFEST, f)
+
+    _write_atomic(_disk_cache_path('manifest.json'), write)
+
+def _load_disk_manifest():
+    """
+    Carga el manifest una vez por proceso (debe llamarse con _DISK_CACHE_LOCK tomado).
+    Si la versión de esquema no coincide se descarta todo el contenido.
+    """
+    global _DISK_MANIFEST
+    if _DISK_MANIFEST is not None:
+        return _DISK_MANIFEST
+
+    os.makedirs(DISK_CACHE_DIR, exist_ok=True)
+    manifest = None
+    try:
+        with open(_disk_cache_path('manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    if not manifest or manifest.get('schema_version') != DISK_CACHE_SCHEMA_VERSION:
+        if manifest:
+            logger.info("Caché en disco con otra versión de esquema, se descarta")
+        manifest = {'schema_version': DISK_CACHE_SCHEMA_VERSION, 'entries': {}}
+
+    # Borrar archivos que no están en el manifest (escrituras interrumpidas o esquema viejo)
+    known_files = {entry['file'] for entry in manifest['entries'].values()}
+    for name in os.listdir(DISK_CACHE_DIR):
+        if (name.endswith('.parquet') or name.endswith('.tmp')) and name not in known_files:
+            try:
+                os.remove(_disk_cache_path(name))
+            except OSError:
+                pass
+
+    _DISK_MANIFEST = manifest
+    return manifest
+
+def _evict_disk_cache(manifest):
+    """
+    Elimina las entradas usadas hace más tiempo hasta volver a DISK_CACHE_MAX_BYTES.
+    Las de DISK_CACHE_PINNED_KEYS no se eliminan (sí cuentan en el total).
+    """
+    total_bytes = sum(entry['bytes'] for entry in manifest['entries'].values())
+    if total_bytes <= DISK_CACHE_MAX_BYTES:
+        return
+
+    by_access = sorted(
+        (item for item in manifest['entries'].items() if item[0] not in DISK_CACHE_PINNED_KEYS),
+        key=lambda item: item[1]['last_access']
+    )
+    for key, entry in by_access:
+        if total_bytes <= DISK_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(_disk_cache_path(entry['file']))
+        except OSError:
+            pass
+        total_bytes -= entry['bytes']
+        del manifest['entries'][key]
+        logger.info(f"Caché en disco: eliminada {key}")
+
+def disk_cache_get(key, max_age=None):
+    """
+    Lee un DataFrame del caché en disco.
+    
+    Args:
+        key: Clave de la entrada
+        max_age: Antigüedad máxima en segundos (None = sin límite)
+    
+    Returns:
+        Tupla (DataFrame, meta) o None si no existe, está vencida o no se puede leer
+    """
+    if not DISK_CACHE_ENABLED:
+        return None
+
+    try:
+        with _DISK_CACHE_LOCK:
+            manifest = _load_disk_manifest()
+            entry = manifest['entries'].get(key)
+            if entry is None:
+                return None
+            if max_age is not None and datetime.now().timestamp() - entry['created_at'] > max_age:
+                return None
+            entry['last_access'] = datetime.now().timestamp()
+            path = _disk_cache_path(entry['file'])
+            meta = entry.get('meta', {})
+
+        return pd.read_parquet(path), meta
+    except Exception as e:
+        logger.warning(f"No se pudo leer {key} del caché en disco: {e}")
+        return None
+
+def disk_cache_put(key, df, meta=None):
+    """
+    Guarda un DataFrame en el caché en disco (escritura atómica).
+    Los errores solo se registran: el caché en disco es opcional.
+    """
+    disk_cache_put_many([(key, df, meta)])
+
+def disk_cache_put_many(items):
+    """
+    Guarda varios DataFrames en el caché en disco con una sola escritura del
+    manifest (p. ej. todas las particiones diarias de un fetch).
+    
+    Args:
+        items: Iterable de tuplas (key, df, meta)
+    """
+    if not DISK_CACHE_ENABLED:
+        return
+
+    try:
+        with _DISK_CACHE_LOCK:
+            manifest = _load_disk_manifest()
+            stored = 0
+            for key, df, meta in items:
+                if df is None:
+                    continue
+                try:
+                    file_name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.parquet'
+                    path = _disk_cache_path(file_name)
+                    _write_atomic(path, lambda tmp_path: df.to_parquet(tmp_path, index=False))
+
+                    now = datetime.now().timestamp()
+                    manifest['entries'][key] = {
+                        'file': file_name,
+                        'bytes': os.path.getsize(path),
+                        'created_at': now,
+                        'last_access': now,
+                        'meta': meta or {}
+                    }
+                    stored += 1
+                except Exception as e:
+                    logger.warning(f"No se pudo guardar {key} en el caché en disco: {e}")
+            if stored:
+                _evict_disk_cache(manifest)
+                _save_disk_manifest()
+    except Exception as e:
+        logger.warning(f"No se pudo actualizar el caché en disco: {e}")
+
+def disk_cache_expire(key):
+    """
+    Marca una entrada del caché en disco como vencida sin borrarla: las
+    lecturas con max_age la ignoran y las que no lo usan (p. ej. la base de
+    la sincronización incremental del Sheet) la siguen encontrando
+    """
+    if not DISK_CACHE_ENABLED:
+        return
+
+    try:
+        with _DISK_CACHE_LOCK:
+            entry = _load_disk_manifest()['entries'].get(key)
+            if entry is not None:
+                entry['created_at'] = 0
+                _save_disk_manifest()
+    except Exception as e:
+        logger.warning(f"No se pudo vencer {key} en el caché en disco: {e}")
+
+def disk_cache_delete(match):
+    """
+    Elimina del caché en disco las entradas para las que match(key, meta) es True
+    
+    Returns:
+        Cantidad de entradas eliminadas
+    """
+    if not DISK_CACHE_ENABLED:
+        return 0
+
+    try:
+        with _DISK_CACHE_LOCK:
+            manifest = _load_disk_manifest()
+            keys = [key for key, entry in manifest['entries'].items() if match(key, entry.get('meta', {}))]
+            for key in keys:
+                try:
+                    os.remove(_disk_cache_path(manifest['entries'][key]['file']))
+                except OSError:
+                    pass
+                del manifest['entries'][key]
+            if keys:
+                _save_disk_manifest()
+        return len(keys)
+    except Exception as e:
+        logger.warning(f"No se pudo limpiar el caché en disco: {e}")
+        return 0
+
+# ==================== PRESUPUESTO DE MEMORIA ====================
+
+# Contadores por caché en proceso
+_CACHE_STATS = {
+    name: {'hits': 0, 'misses': 0, 'stale_hits': 0, 'evictions': 0}
+    for name in ('loaders', 'ga4_partitions')
+}
+_CACHE_STATS_LOCK = threading.Lock()
+
+def _count_cache_event(cache, event, count=1):
+    if count:
+        with _CACHE_STATS_LOCK:
+            _CACHE_STATS[cache][event] += count
+
+def _estimate_bytes(value):
+    """
+    Tamaño aproximado en memoria de un valor cacheado
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict) and value and all(isinstance(item, pd.DataFrame) for item in value.values()):
+        return sum(_estimate_bytes(item) for item in value.values())
+    try:
+        return len(pickle.dumps(value))
+    except Exception:
+        return 0
+
+def _enforce_memory_budget():
+    """
+    Descarta entradas de los loaders y particiones GA4 por LRU (último acceso)
+    hasta volver a MEMORY_CACHE_MAX_BYTES
+    """
+    evicted = {'loaders': 0, 'ga4_partitions': 0}
+    with _LOADER_CACHE_LOCK, _GA4_DAY_PARTITIONS_LOCK:
+        stores = {'loaders': _LOADER_CACHE, 'ga4_partitions': _GA4_DAY_PARTITIONS}
+        total_bytes = sum(entry['bytes'] for store in stores.values() for entry in store.values())
+        if total_bytes <= MEMORY_CACHE_MAX_BYTES:
+            return
+
+        candidates = sorted(
+            ((entry['last_access'], name, key) for name, store in stores.items() for key, entry in store.items()),
+            key=lambda item: item[0]
+        )
+        for _, name, key in candidates:
+            if total_bytes <= MEMORY_CACHE_MAX_BYTES:
+                break
+            total_bytes -= stores[name].pop(key)['bytes']
+            evicted[name] += 1
+
+    for name, count in evicted.items():
+        _count_cache_event(name, 'evictions', count)
+    logger.info(f"Caché en memoria sobre el presupuesto: descartadas {evicted}")
+
+def get_cache_stats():
+    """
+    Estado de los cachés en proceso para monitoreo
+    
+    Returns:
+        dict {caché: {'hits', 'misses', 'stale_hits', 'evictions', 'entries', 'bytes'}}
+        más 'budget_bytes'
+    """
+    with _LOADER_CACHE_LOCK, _GA4_DAY_PARTITIONS_LOCK:
+        sizes = {
+            name: (len(store), sum(entry['bytes'] for entry in store.values()))
+            for name, store in (('loaders', _LOADER_CACHE), ('ga4_partitions', _GA4_DAY_PARTITIONS))
+        }
+    with _CACHE_STATS_LOCK:
+        stats = {name: dict(counters) for name, counters in _CACHE_STATS.items()}
+    for name, (entries, total_bytes) in sizes.items():
+        stats[name]['entries'] = entries
+        stats[name]['bytes'] = total_bytes
+    stats['budget_bytes'] = MEMORY_CACHE_MAX_BYTES
+    return stats
+
+# ==================== CACHÉ DE REPORTES GA4 ====================
+
+# Particiones diarias de reportes GA4: (property_id, report, date) -> partición
+_GA4_DAY_PARTITIONS = {}
+_GA4_DAY_PARTITIONS_LOCK = threading.Lock()
+# Rangos (property_id, report, (start, end)) que se están refrescando en segundo plano
+_GA4_REFRESHING = set()
+
+def get_ga4_property_timezone(property_id):
+    """
+    Zona horaria de una propiedad GA4: la 'timezone' del medio que la usa en
+    create_media_config o GA4_DEFAULT_TIMEZONE
+    """
+    for config in create_media_config().values():
+        if str(config.get('property_id')) == str(property_id) and config.get('timezone'):
+            return config['timezone']
+    return GA4_DEFAULT_TIMEZONE
+
+def ga4_property_now(property_id):
+    """
+    Hora actual (naive) en la zona horaria de la propiedad, la misma con la
+    que GA4 corta los días
+    """
+    timezone = get_ga4_property_timezone(property_id)
+    try:
+        zone = ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"GA4 property {property_id}: zona horaria inválida '{timezone}', se usa {GA4_DEFAULT_TIMEZONE}")
+        zone = ZoneInfo(GA4_DEFAULT_TIMEZONE)
+    return datetime.now(zone).replace(tzinfo=None)
+
+def dashboard_default_ranges(property_id, page_type):
+    """
+    Rangos GA4 que pide un dashboard con los widgets en su valor por defecto:
+    sidebar, mes en curso y comparativa dominio vs Sheet (el mes en curso en
+    redacción, DASHBOARD_DEFAULT_COMPARISON_RANGE en cliente)
+    """
+    month_range = ga4_current_month_range(property_id)
+    comparison_range = month_range if page_type == 'redaccion' else DASHBOARD_DEFAULT_COMPARISON_RANGE
+    return [DASHBOARD_DEFAULT_RANGE, month_range, comparison_range]
+
+def ga4_current_month_range(property_id):
+    """
+    Mes en curso de la propiedad (del día 1 a hoy, en su zona horaria) como
+    fechas 'YYYY-MM-DD' de GA4
+    """
+    today = ga4_property_now(property_id)
+    return today.replace(day=1).strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')
+
+def _is_ga4_day_closed(day, fetched_at):
+    """
+    Un día está cerrado si se pidió cuando ya habían pasado GA4_CLOSED_DAY_LAG_HOURS desde su fin.
+    fetched_at está en la hora de la propiedad (ver ga4_property_now)
+    """
+    day_end = datetime.combine(day + timedelta(days=1), datetime.min.time())
+    return fetched_at - day_end >= timedelta(hours=GA4_CLOSED_DAY_LAG_HOURS)
+
+def _ga4_partition_is_fresh(partition, now):
+    """
+    Las particiones cerradas no vencen; las abiertas duran GA4_OPEN_DAY_TTL segundos
+    """
+    if partition['closed']:
+        return True
+    return (now - partition['fetched_at']).total_seconds() < GA4_OPEN_DAY_TTL
+
+def _contiguous_day_runs(days):
+    """
+    Agrupa una lista ordenada de días en rangos contiguos (start, end)
+    """
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+def _ga4_partition_disk_key(property_id, report, day):
+    return f"ga4/{property_id}/{report}/{day.isoformat()}"
+
+def _new_ga4_partition(frame, fetched_at, closed):
+    return {
+        'frame': frame,
+        'fetched_at': fetched_at,
+        'closed': closed,
+        'bytes': _estimate_bytes(frame),
+        'last_access': time.monotonic()
+    }
+
+def _load_ga4_partition_from_disk(property_id, report, day):
+    """
+    Recupera una partición diaria del caché en disco
+    """
+    cached = disk_cache_get(_ga4_partition_disk_key(property_id, report, day))
+    if cached is None:
+        return None
+    frame, meta = cached
+    return _new_ga4_partition(frame, datetime.fromisoformat(meta['fetched_at']), meta['closed'])
+
+def _fetch_ga4_day_runs(client, property_id, request_body, runs, report, page_size=None, max_in_flight=None):
+    """
+    Pide a GA4 los rangos de días indicados y guarda cada día como partición
+    (en memoria y en disco)
+    
+    Returns:
+        dict {date: partición} con los días pedidos
+    """
+    fetched = {}
+    for run_start, run_end in runs:
+        body = dict(request_body)
+        body['dateRanges'] = [{'startDate': run_start.strftime('%Y-%m-%d'),
+                               'endDate': run_end.strftime('%Y-%m-%d')}]
+        fetched_at = ga4_property_now(property_id)
+        run_df = run_ga4_report(client, property_id, body, page_size=page_size, max_in_flight=max_in_flight)
+        
+        by_day = {}
+        if not run_df.empty:
+            by_day = {day: group for day, group in run_df.groupby(run_df['date'].dt.date)}
+        
+        new_partitions = {}
+        for offset in range((run_end - run_start).days + 1):
+            day = run_start + timedelta(days=offset)
+            # Los días sin filas también se guardan para no volver a pedirlos
+            frame = by_day.get(day, run_df.iloc[0:0])
+            new_partitions[day] = _new_ga4_partition(
+                frame.reset_index(drop=True), fetched_at, _is_ga4_day_closed(day, fetched_at)
+            )
+        
+        with _GA4_DAY_PARTITIONS_LOCK:
+            for day, partition in new_partitions.items():
+                _GA4_DAY_PARTITIONS[(property_id, report, day)] = partition
+        fetched.update(new_partitions)
+        _enforce_memory_budget()
+        
+        disk_cache_put_many(
+            (
+                _ga4_partition_disk_key(property_id, report, day),
+                partition['frame'],
+                {'fetched_at': partition['fetched_at'].isoformat(), 'closed': partition['closed']}
+            )
+            for day, partition in new_partitions.items()
+        )
+    return fetched
+
+def _refresh_ga4_day_runs_async(client, property_id, request_body, runs, report, page_size=None, max_in_flight=None):
+    """
+    Refresca en un thread de fondo particiones vencidas que se sirvieron igual
+    (stale-while-revalidate). Un mismo rango no se refresca dos veces en paralelo.
+    """
+    with _GA4_DAY_PARTITIONS_LOCK:
+        runs = [run for run in runs if (property_id, report, run) not in _GA4_REFRESHING]
+        _GA4_REFRESHING.update((property_id, report, run) for run in runs)
+    if not runs:
+        return
+
+    def refresh():
+        try:
+            _fetch_ga4_day_runs(client, property_id, request_body, runs, report, page_size, max_in_flight)
+        except Exception as e:
+            logger.warning(f"GA4 property {property_id}: no se pudieron refrescar particiones vencidas: {e}")
+        finally:
+            with _GA4_DAY_PARTITIONS_LOCK:
+                _GA4_REFRESHING.difference_update((property_id, report, run) for run in runs)
+
+    threading.Thread(target=refresh, name=f"ga4-refresh-{property_id}", daemon=True).start()
+
+def run_ga4_report_by_day(client, property_id, request_body, start, end, report="pagePath_date",
+                          page_size=None, max_in_flight=None):
+    """
+    Ejecuta un reporte con dimensión 'date' usando un caché particionado por día.
+    
+    Cada día del rango se guarda por separado. Los días cerrados (ver
+    GA4_CLOSED_DAY_LAG_HOURS) no vencen; hoy y ayer se refrescan cada
+    GA4_OPEN_DAY_TTL segundos. Solo se piden a GA4 los días faltantes o
+    vencidos, agrupados en rangos contiguos, y el resultado se arma
+    concatenando las particiones.
+    
+    Una partición abierta vencida con menos de GA4_OPEN_DAY_MAX_STALE segundos
+    se sirve igual y se refresca en segundo plano; solo se espera a GA4 por
+    los días que faltan o que superan ese límite.
+    
+    Args:
+        client: Cliente GA4
+        property_id: ID de la propiedad GA4
+        request_body: Body del runReport sin 'dateRanges' (debe incluir la dimensión 'date')
+        start, end: Rango pedido (datetime.date)
+        report: Nombre del reporte, forma parte de la clave de las particiones
+    
+    Returns:
+        DataFrame con las filas del rango ordenadas por fecha
+    """
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    now = ga4_property_now(property_id)
+    
+    with _GA4_DAY_PARTITIONS_LOCK:
+        partitions = {day: _GA4_DAY_PARTITIONS.get((property_id, report, day)) for day in days}
+        for partition in partitions.values():
+            if partition is not None:
+                partition['last_access'] = time.monotonic()
+    
+    # Lo que no está en memoria se busca en el caché en disco (p. ej. tras un reinicio)
+    loaded_from_disk = False
+    for day, partition in partitions.items():
+        if partition is None:
+            partition = _load_ga4_partition_from_disk(property_id, report, day)
+            if partition is not None:
+                with _GA4_DAY_PARTITIONS_LOCK:
+                    _GA4_DAY_PARTITIONS.setdefault((property_id, report, day), partition)
+                partitions[day] = partition
+                loaded_from_disk = True
+    if loaded_from_disk:
+        _enforce_memory_budget()
+    
+    missing = []
+    stale = []
+    for day, partition in partitions.items():
+        if partition is None:
+            missing.append(day)
+        elif not _ga4_partition_is_fresh(partition, now):
+            if (now - partition['fetched_at']).total_seconds() < GA4_OPEN_DAY_MAX_STALE:
+                stale.append(day)
+            else:
+                missing.append(day)
+    
+    _count_cache_event('ga4_partitions', 'hits', len(days) - len(missing) - len(stale))
+    _count_cache_event('ga4_partitions', 'stale_hits', len(stale))
+    _count_cache_event('ga4_partitions', 'misses', len(missing))
+    
+    runs = _contiguous_day_runs(missing)
+    if runs or stale:
+        logger.info(f"GA4 property {property_id}: {len(days) - len(missing) - len(stale)} días en caché, "
+                    f"{len(missing)} a pedir en {len(runs)} rangos, {len(stale)} vencidos a refrescar")
+    
+    if stale:
+        _refresh_ga4_day_runs_async(client, property_id, request_body, _contiguous_day_runs(stale), report,
+                                    page_size, max_in_flight)
+    
+    partitions.update(
+        _fetch_ga4_day_runs(client, property_id, request_body, runs, report, page_size, max_in_flight)
+    )
+    
+    # Antigüedad de los datos servidos (los días cerrados ya no cambian)
+    open_ages = [(now - partitions[day]['fetched_at']).total_seconds() for day in days if not partitions[day]['closed']]
+    note_served_data_age(max([0] + open_ages))
+    
+    frames = [partitions[day]['frame'] for day in days if not partitions[day]['frame'].empty]
+    if not frames:
+        return partitions[days[0]]['frame'].copy() if days else pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+# ==================== DICCIONARIO DE URLS ====================
+
+# Diccionario de URLs normalizadas del proceso: URL -> id entero (int32), y la
+# lista inversa id -> URL para volver a los strings al mostrarlos. Solo crece: los ids tienen que ser estables mientras haya frames (cacheados o
+# no) que los referencien, y no se sabe cuándo deja de haberlos. Igual queda
+# acotado: solo agregan URLs las particiones del Sheet y los SheetUrlIndex
+# (armados con URLs del Sheet); las de GA4 se buscan con add=False. Su tamaño
+# es entonces la cantidad de URLs distintas que pasaron por el Sheet desde que
+# arrancó el proceso: las filas actuales más las borradas, que en un Sheet al
+# que solo se le agregan artículos son pocas. Del orden de 150 bytes por URL.
+_URL_IDS = {}
+_URL_ID_VALUES = []
+_URL_IDS_LOCK = threading.Lock()
+
+def encode_urls(urls, add=True):
+    """
+    Traduce URLs normalizadas a ids enteros del diccionario del proceso.
+    
+    Cada URL distinta se busca una sola vez (factorize) y el resultado se
+    expande con take, así que el costo en Python es por URL única.
+    
+    Args:
+        urls: Serie, array o lista de URLs normalizadas
+        add: Si True, las URLs nuevas se agregan al diccionario; si False,
+            las que no están devuelven -1
+    
+    Returns:
+        np.ndarray int32 alineado con urls (-1 para nulos y URLs desconocidas)
+    """
+    codes, uniques = pd.factorize(np.asarray(urls, dtype=object))
+    unique_ids = np.empty(len(uniques) + 1, dtype=np.int32)
+    unique_ids[-1] = -1  # destino de los códigos -1 (nulos)
+    with _URL_IDS_LOCK:
+        for i, url in enumerate(uniques):
+            url_id = _URL_IDS.get(url)
+            if url_id is None:
+                if not add:
+                    unique_ids[i] = -1
+                    continue
+                url_id = len(_URL_IDS)
+                _URL_IDS[url] = url_id
+                _URL_ID_VALUES.append(url)
+            unique_ids[i] = url_id
+    return unique_ids.take(codes)
+
+def decode_urls(url_ids):
+    """
+    Traduce ids de encode_urls a las URLs normalizadas (None para -1).
+    Como encode_urls, resuelve cada id distinto una sola vez.
+    
+    Returns:
+        np.ndarray de objetos alineado con url_ids
+    """
+    codes, uniques = pd.factorize(np.asarray(url_ids))
+    unique_urls = np.empty(len(uniques) + 1, dtype=object)
+    with _URL_IDS_LOCK:
+        for i, url_id in enumerate(uniques):
+            unique_urls[i] = _URL_ID_VALUES[url_id] if url_id >= 0 else None
+    return unique_urls.take(codes)
+
+def _url_set_ids(url_ids):
+    """
+    Ids distintos y válidos (ordenados) de un conjunto de URLs
+    """
+    url_ids = np.asarray(url_ids, dtype=np.int32)
+    return np.unique(url_ids[url_ids >= 0])
+
+def _url_set_handle(url_ids):
+    """
+    Handle de un conjunto de URLs a partir de sus ids (ver _url_set_ids)
+    """
+    return "urls:" + hashlib.sha1(url_ids.tobytes()).hexdigest()
+
+# ==================== CONJUNTOS DE URLS ====================
+
+class SheetUrlIndex:
+    """
+    Índice de las URLs normalizadas de una partición del Sheet.
+    
+    Se construye una vez por conjunto de URLs (ver register_url_set) y lo
+    reciben todas las funciones que filtran por URLs del Sheet: pertenencia
+    vectorizada y los pagePaths candidatos del pushdown memoizados por
+    dominio. Dos índices con las mismas URLs son iguales y tienen el mismo
+    hash, así que sirven como argumento de los loaders cacheados.
+    
+    Se arma con los ids enteros del diccionario de URLs (encode_urls), que
+    ya vienen en la columna url_id de las particiones: la pertenencia se
+    resuelve con np.isin sobre ids y los strings solo se recuperan (una vez)
+    para derivar los pagePaths.
+    """
+
+    def __init__(self, url_ids):
+        self.ids = _url_set_ids(url_ids)
+        self.handle = _url_set_handle(self.ids)
+        self._page_paths = {}
+
+    @classmethod
+    def from_urls(cls, urls):
+        """Índice de una lista de URLs normalizadas"""
+        return cls(encode_urls(urls))
+
+    @functools.cached_property
+    def urls(self):
+        """URLs normalizadas del conjunto"""
+        return tuple(decode_urls(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.urls)
+
+    def __contains__(self, url):
+        return bool(self.contains([url])[0])
+
+    def __eq__(self, other):
+        return isinstance(other, SheetUrlIndex) and other.handle == self.handle
+
+    def __hash__(self):
+        return hash(self.handle)
+
+    def contains(self, values):
+        """
+        Máscara booleana: qué valores son URLs del Sheet
+        """
+        return np.isin(encode_urls(values, add=False), self.ids)
+
+    def page_paths(self, domain=None):
+        """
+        pagePaths candidatos para el pushdown a GA4 (ver sheet_urls_to_page_paths)
+        """
+        if domain not in self._page_paths:
+            self._page_paths[domain] = sheet_urls_to_page_paths(self.urls, domain)
+        return self._page_paths[domain]
+
+# Registro de índices de URLs del Sheet: handle -> SheetUrlIndex
+_URL_SETS = OrderedDict()
+_URL_SETS_LOCK = threading.Lock()
+
+def _loader_cache_url_handles():
+    """
+    Handles de conjuntos de URLs que aparecen en los argumentos de entradas
+    de los loaders cacheados (o que se están refrescando) o en las
+    particiones del Sheet cacheadas
+    """
+    with _LOADER_CACHE_LOCK:
+        keys = list(_LOADER_CACHE) + list(_LOADER_REFRESHING)
+        values = [entry['value'] for entry in _LOADER_CACHE.values()]
+    handles = {
+        value
+        for _, arguments in keys
+        for _, value in arguments
+        if isinstance(value, str) and value.startswith('urls:')
+    }
+    # Particiones del Sheet cacheadas: su handle va en attrs['url_set']
+    for value in values:
+        if isinstance(value, dict):
+            handles.update(
+                frame.attrs['url_set'] for frame in value.values()
+                if isinstance(frame, pd.DataFrame) and frame.attrs.get('url_set')
+            )
+    return handles
+
+def register_url_set(urls):
+    """
+    Registra un conjunto de URLs normalizadas y devuelve un handle corto
+    derivado de su contenido ('urls:<sha1>' de sus ids).
+    
+    Los loaders cacheados reciben el handle en lugar de la lista, así la
+    clave del caché es un string corto y no miles de URLs a hashear en cada
+    lectura. El mismo conjunto produce siempre el mismo handle; si ya está
+    registrado no se arma otro SheetUrlIndex.
+    
+    Al superar URL_SET_REGISTRY_SIZE se descartan los conjuntos usados hace
+    más tiempo, salvo los que todavía son argumento de una entrada de los
+    loaders (su refresh en segundo plano tiene que poder resolver el handle)
+    o los de una partición del Sheet cacheada.
+    
+    Args:
+        urls: URLs normalizadas, array de ids de encode_urls (p. ej. la
+            columna url_id de una partición) o un SheetUrlIndex
+    
+    Returns:
+        Handle del conjunto, o None si no hay URLs
+    """
+    if urls is None:
+        return None
+    if isinstance(urls, SheetUrlIndex):
+        index = urls
+    else:
+        if isinstance(urls, (np.ndarray, pd.Series)) and urls.dtype.kind in 'iu':
+            url_ids = _url_set_ids(urls)
+        else:
+            url_ids = _url_set_ids(encode_urls(list(urls)))
+        handle = _url_set_handle(url_ids)
+        with _URL_SETS_LOCK:
+            index = _URL_SETS.get(handle)
+            if index is not None:
+                _URL_SETS.move_to_end(handle)
+                return handle
+        index = SheetUrlIndex(url_ids)
+    if not len(index):
+        return None
+    with _URL_SETS_LOCK:
+        _URL_SETS.setdefault(index.handle, index)
+        _URL_SETS.move_to_end(index.handle)
+        overflow = len(_URL_SETS) - URL_SET_REGISTRY_SIZE
+    if overflow > 0:
+        referenced = _loader_cache_url_handles()
+        with _URL_SETS_LOCK:
+            for handle in list(_URL_SETS):
+                if len(_URL_SETS) <= URL_SET_REGISTRY_SIZE:
+                    break
+                if handle not in referenced and handle != index.handle:
+                    del _URL_SETS[handle]
+    return index.handle
+
+def get_sheet_url_index(sheets_urls):
+    """
+    Devuelve el SheetUrlIndex de un handle de register_url_set, de una lista
+    de URLs o del propio índice. None (o una lista vacía) devuelve None.
+    Un handle que ya no está registrado levanta KeyError: los loaders la
+    dejan propagar para no cachear un resultado vacío.
+    """
+    if isinstance(sheets_urls, SheetUrlIndex):
+        return sheets_urls
+    if not sheets_urls:
+        return None
+    if isinstance(sheets_urls, str):
+        with _URL_SETS_LOCK:
+            index = _URL_SETS.get(sheets_urls)
+        if index is None:
+            raise KeyError(f"Conjunto de URLs no registrado: {sheets_urls}")
+        return index
+    return SheetUrlIndex.from_urls(sheets_urls)
+
+# ==================== CACHÉ DE LOADERS ====================
+
+# Entradas de los loaders cacheados: (función, argumentos) -> {'value', 'stored_at', 'last_access', 'bytes', 'scope'}
+_LOADER_CACHE = {}
+_LOADER_CACHE_LOCK = threading.Lock()
+# Claves que se están refrescando en segundo plano
+_LOADER_REFRESHING = set()
+# Último "Actualizar datos" aceptado por alcance (property_id o 'sheet')
+_LAST_INVALIDATION = {}
+# Antigüedad máxima de los datos servidos en el thread actual (un rerun de Streamlit)
+_SERVED_DATA = threading.local()
+
+def reset_served_data_age():
+    """
+    Reinicia la antigüedad de datos servidos; se llama al empezar un rerun
+    """
+    _SERVED_DATA.age = 0
+
+def note_served_data_age(age):
+    """
+    Registra la antigüedad (segundos) de un dato servido desde caché
+    """
+    _SERVED_DATA.age = max(getattr(_SERVED_DATA, 'age', 0), age)
+
+def get_served_data_age():
+    """
+    Antigüedad en segundos del dato más viejo servido desde reset_served_data_age
+    """
+    return getattr(_SERVED_DATA, 'age', 0)
+
+def _freeze_cache_arg(value):
+    """
+    Convierte un argumento en algo hasheable para usarlo en la clave del caché
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze_cache_arg(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze_cache_arg(item)) for key, item in value.items()))
+    return value
+
+def _copy_on_write_enabled():
+    """True si pandas trabaja con Copy-on-Write (siempre desde pandas 3)"""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.get_option('mode.copy_on_write') is True
+
+def _share_frame(df):
+    """
+    Copia de un DataFrame cacheado para entregar al llamador. Con
+    Copy-on-Write alcanza una copia superficial (modificarla no altera el
+    original); sin él se copian los datos.
+    """
+    return df.copy(deep=not _copy_on_write_enabled())
+
+def _share_cached_value(value):
+    """
+    Entrega un valor cacheado. Los DataFrames (sueltos o en un dict, como las
+    particiones del Sheet) salen con _share_frame; el resto, que son dicts
+    chicos, como copia.
+    """
+    if isinstance(value, pd.DataFrame):
+        return _share_frame(value)
+    if isinstance(value, dict) and value and all(isinstance(item, pd.DataFrame) for item in value.values()):
+        return {key: _share_frame(item) for key, item in value.items()}
+    return copy.deepcopy(value)
+
+def _store_loader_value(key, value, entry_scope):
+    if value is None:
+        return
+    now = time.monotonic()
+    with _LOADER_CACHE_LOCK:
+        _LOADER_CACHE[key] = {
+            'value': value,
+            'stored_at': now,
+            'last_access': now,
+            'bytes': _estimate_bytes(value),
+            'scope': entry_scope
+        }
+    _enforce_memory_budget()
+
+def _refresh_loader_async(key, func, args, kwargs, entry_scope):
+    """
+    Recalcula una entrada vencida en un thread de fondo (una sola vez por clave)
+    """
+    with _LOADER_CACHE_LOCK:
+        if key in _LOADER_REFRESHING:
+            return
+        _LOADER_REFRESHING.add(key)
+
+    def refresh():
+        try:
+            value, _ = _single_flight(('loader', key), lambda: func(*args, **kwargs))
+            _store_loader_value(key, value, entry_scope)
+        except Exception as e:
+            logger.warning(f"No se pudo refrescar {func.__qualname__} en segundo plano: {e}")
+        finally:
+            with _LOADER_CACHE_LOCK:
+                _LOADER_REFRESHING.discard(key)
+
+    threading.Thread(target=refresh, name=f"refresh-{func.__qualname__}", daemon=True).start()
+
+def loader_cache(ttl, scope_arg=None, scope=None, max_stale=None):
+    """
+    Caché en memoria para los loaders de datos (reemplaza a st.cache_data).
+    
+    A diferencia de st.cache_data, cada entrada queda asociada a un alcance
+    (la propiedad GA4 o el Sheet) y se puede invalidar solo ese alcance con
+    invalidate_cache_scope, sin tocar los datos de los demás medios.
+    Los resultados None (errores) no se guardan. Las llamadas concurrentes
+    con los mismos argumentos comparten una sola ejecución del loader.
+    Los DataFrames se entregan con _share_frame (ver _share_cached_value).
+    Los DataFrames se entregan como vistas sin copia (ver _share_cached_value).
+    
+    Con max_stale, una entrada vencida se sigue devolviendo al instante
+    mientras se recalcula en segundo plano (stale-while-revalidate); solo
+    cuando supera max_stale segundos la lectura espera al loader.
+    
+    Args:
+        ttl: Segundos de validez de cada entrada
+        scope_arg: Nombre del argumento que define el alcance (p. ej. 'property_id')
+        scope: Alcance fijo cuando no depende de los argumentos (p. ej. 'sheet')
+        max_stale: Antigüedad máxima en segundos de una entrada vencida que se sirve igual
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__qualname__, _freeze_cache_arg(tuple(bound.arguments.items())))
+            entry_scope = bound.arguments[scope_arg] if scope_arg else scope
+
+            with _LOADER_CACHE_LOCK:
+                entry = _LOADER_CACHE.get(key)
+                if entry is not None:
+                    entry['last_access'] = time.monotonic()
+            if entry is not None:
+                age = time.monotonic() - entry['stored_at']
+                if age < ttl:
+                    _count_cache_event('loaders', 'hits')
+                    note_served_data_age(age)
+                    return _share_cached_value(entry['value'])
+                if max_stale is not None and age < max_stale:
+                    _count_cache_event('loaders', 'stale_hits')
+                    _refresh_loader_async(key, func, args, kwargs, entry_scope)
+                    note_served_data_age(age)
+                    return _share_cached_value(entry['value'])
+
+            _count_cache_event('loaders', 'misses')
+            # Las sesiones que piden lo mismo a la vez esperan a una única ejecución
+            value, _ = _single_flight(('loader', key), lambda: func(*args, **kwargs))
+            _store_loader_value(key, value, entry_scope)
+            return _share_cached_value(value)
+
+        return wrapper
+    return decorator
+
+def invalidate_cache_scope(scope):
+    """
+    Elimina las entradas de los loaders cacheados de un alcance
+    
+    Returns:
+        Cantidad de entradas eliminadas
+    """
+    with _LOADER_CACHE_LOCK:
+        keys = [key for key, entry in _LOADER_CACHE.items() if entry['scope'] == scope]
+        for key in keys:
+            del _LOADER_CACHE[key]
+    return len(keys)
+
+def refresh_property_data(property_id, include_sheet=True):
+    """
+    Invalida los datos de una propiedad GA4 (botón "Actualizar datos").
+    
+    Solo se descartan las entradas de esa propiedad: los loaders cacheados y
+    las particiones diarias abiertas (hoy / ayer) en memoria y en disco. Los
+    días cerrados no cambian en GA4 y se conservan. Con include_sheet también
+    se vuelve a leer el Google Sheet.
+    
+    Cada propiedad (y el Sheet) se invalida como mucho una vez cada
+    CACHE_REFRESH_COOLDOWN segundos, para que los clics repetidos no disparen
+    una ráfaga de requests.
+    
+    Returns:
+        Segundos que faltan para poder volver a actualizar (0 si se invalidó)
+    """
+    now = time.monotonic()
+
+    with _LOADER_CACHE_LOCK:
+        remaining = CACHE_REFRESH_COOLDOWN - (now - _LAST_INVALIDATION.get(property_id, float('-inf')))
+        if remaining > 0:
+            return int(remaining) + 1
+        _LAST_INVALIDATION[property_id] = now
+        # El Sheet es compartido: si otro medio lo acaba de refrescar no se vuelve a pedir
+        refresh_sheet = include_sheet and now - _LAST_INVALIDATION.get('sheet', float('-inf')) >= CACHE_REFRESH_COOLDOWN
+        if refresh_sheet:
+            _LAST_INVALIDATION['sheet'] = now
+
+    dropped = invalidate_cache_scope(property_id)
+
+    with _GA4_DAY_PARTITIONS_LOCK:
+        open_keys = [
+            key for key, partition in _GA4_DAY_PARTITIONS.items()
+            if key[0] == property_id and not partition['closed']
+        ]
+        for key in open_keys:
+            del _GA4_DAY_PARTITIONS[key]
+
+    disk_prefix = f"ga4/{property_id}/"
+    disk_cache_delete(lambda key, meta: key.startswith(disk_prefix) and not meta.get('closed'))
+
+    if refresh_sheet:
+        dropped += invalidate_cache_scope('sheet')
+        # La copia se conserva como base de la sincronización incremental: solo se vence
+        disk_cache_expire('sheets/main')
+
+    logger.info(f"Caché invalidado para property {property_id}: {dropped} entradas, "
+                f"{len(open_keys)} particiones abiertas")
+    return 0
+
+@loader_cache(ttl=300, scope_arg='property_id', max_stale=LOADER_MAX_STALE)
+def get_ga4_data_with_country(property_id, credentials_file, start_date="7daysAgo", end_date="today", country_filter=None,
+                              page_size=None, max_in_flight=None):
     """
     Obtiene datos de Google Analytics 4 para una propiedad específica con opción de filtrar por país
+    page_size / max_in_flight: paginación del reporte (ver run_ga4_report)
     """
     try:
         # Determinar qué tipo de cuenta usar según la propiedad
-        if property_id == "255037852":  # OK Diario usa acceso_medios
-            account_type = "acceso_medios"
-        elif credentials_file == "damian_credentials_analytics_2025.json":  # Mundo Deportivo usa damian
-            account_type = "damian"
-        else:  # Clarín y Olé usan acceso
-            account_type = "acceso"
+        account_type = _resolve_ga4_account_type(property_id, credentials_file)
         
         # Usar siempre Streamlit secrets
         if hasattr(st, 'secrets'):
             secret_key = f'google_oauth_{account_type}'
             if secret_key in st.secrets:
                 logger.info(f"Usando credenciales {account_type} desde Streamlit secrets")
-                client = get_ga4_client_oauth(credentials_file, account_type)
+                client = get_ga4_client(account_type)
             else:
                 logger.error(f"No se encontró la sección {secret_key} en Streamlit secrets")
                 st.error(f"🔑 Falta configurar {secret_key} en Streamlit secrets")
@@ -311,8 +1826,7 @@ def get_ga4_data_with_country(property_id, credentials_file, start_date="7daysAg
                 {'name': 'newUsers'},
                 {'name': 'engagementRate'}
             ],
-            'dateRanges': [{'startDate': start_date, 'endDate': end_date}],
-            'limit': 100000
+            'dateRanges': [{'startDate': start_date, 'endDate': end_date}]
         }
         
         # Agregar filtro de país si se especifica
@@ -327,38 +1841,9 @@ def get_ga4_data_with_country(property_id, credentials_file, start_date="7daysAg
                 }
             }
         
-        # Ejecutar el reporte usando API v1beta
+        # Ejecutar el reporte usando API v1beta (paginado)
         logger.info(f"Consultando GA4 property {property_id}..." + (f" con filtro de país: {country_filter}" if country_filter else ""))
-        response = client.properties().runReport(property=f"properties/{property_id}", body=request_body).execute()
-        
-        # Convertir a DataFrame usando formato API v1beta
-        data = []
-        if 'rows' in response:
-            for row in response['rows']:
-                row_data = {}
-                # Dimensiones
-                for i, dimension in enumerate(response['dimensionHeaders']):
-                    row_data[dimension['name']] = row['dimensionValues'][i]['value']
-                # Métricas
-                for i, metric in enumerate(response['metricHeaders']):
-                    value = row['metricValues'][i]['value']
-                    # Convertir a número si es posible
-                    try:
-                        if '.' in value:
-                            row_data[metric['name']] = float(value)
-                        else:
-                            row_data[metric['name']] = int(value)
-                    except:
-                        row_data[metric['name']] = value
-                data.append(row_data)
-        
-        df = pd.DataFrame(data)
-        
-        # Convertir fecha
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
-            # Formatear fecha como dd/mm/yyyy para mostrar
-            df['date_formatted'] = df['date'].dt.strftime('%d/%m/%Y')
+        df = run_ga4_report(client, property_id, request_body, page_size=page_size, max_in_flight=max_in_flight)
         
         logger.info(f"GA4 datos obtenidos: {len(df)} filas" + (f" (filtrado por {country_filter})" if country_filter else ""))
         return df
@@ -406,27 +1891,25 @@ def get_ga4_data_with_country(property_id, credentials_file, start_date="7daysAg
         
         return None
 
-@st.cache_data(ttl=300)
-def get_ga4_data(property_id, credentials_file, start_date="7daysAgo", end_date="today"):
+def get_ga4_data(property_id, credentials_file, start_date="7daysAgo", end_date="today", page_size=None, max_in_flight=None):
     """
     Obtiene datos de Google Analytics 4 para una propiedad específica
     Determina automáticamente qué cuenta usar según la propiedad
+    page_size / max_in_flight: paginación del reporte (ver run_ga4_report)
+    
+    El caché es por día (ver run_ga4_report_by_day): solo se vuelven a pedir
+    los días que GA4 todavía puede modificar.
     """
     try:
         # Determinar qué tipo de cuenta usar según la propiedad
-        if property_id == "255037852":  # OK Diario usa acceso_medios
-            account_type = "acceso_medios"
-        elif credentials_file == "damian_credentials_analytics_2025.json":  # Mundo Deportivo usa damian
-            account_type = "damian"
-        else:  # Clarín y Olé usan acceso
-            account_type = "acceso"
+        account_type = _resolve_ga4_account_type(property_id, credentials_file)
         
         # Usar siempre Streamlit secrets
         if hasattr(st, 'secrets'):
             secret_key = f'google_oauth_{account_type}'
             if secret_key in st.secrets:
                 logger.info(f"Usando credenciales {account_type} desde Streamlit secrets")
-                client = get_ga4_client_oauth(credentials_file, account_type)
+                client = get_ga4_client(account_type)
             else:
                 logger.error(f"No se encontró la sección {secret_key} en Streamlit secrets")
                 st.error(f"🔑 Falta configurar {secret_key} en Streamlit secrets")
@@ -454,43 +1937,21 @@ def get_ga4_data(property_id, credentials_file, start_date="7daysAgo", end_date=
                 {'name': 'bounceRate'},
                 {'name': 'newUsers'},
                 {'name': 'engagementRate'}
-            ],
-            'dateRanges': [{'startDate': start_date, 'endDate': end_date}],
-            'limit': 100000
+            ]
         }
         
-        # Ejecutar el reporte usando API v1beta
+        # Ejecutar el reporte usando API v1beta (paginado y particionado por día)
         logger.info(f"Consultando GA4 property {property_id}...")
-        response = client.properties().runReport(property=f"properties/{property_id}", body=request_body).execute()
-        
-        # Convertir a DataFrame usando formato API v1beta
-        data = []
-        if 'rows' in response:
-            for row in response['rows']:
-                row_data = {}
-                # Dimensiones
-                for i, dimension in enumerate(response['dimensionHeaders']):
-                    row_data[dimension['name']] = row['dimensionValues'][i]['value']
-                # Métricas
-                for i, metric in enumerate(response['metricHeaders']):
-                    value = row['metricValues'][i]['value']
-                    # Convertir a número si es posible
-                    try:
-                        if '.' in value:
-                            row_data[metric['name']] = float(value)
-                        else:
-                            row_data[metric['name']] = int(value)
-                    except:
-                        row_data[metric['name']] = value
-                data.append(row_data)
-        
-        df = pd.DataFrame(data)
-        
-        # Convertir fecha
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'], format='%Y%m%d')
-            # Formatear fecha como dd/mm/yyyy para mostrar
-            df['date_formatted'] = df['date'].dt.strftime('%d/%m/%Y')
+        today = ga4_property_now(property_id).date()
+        df = run_ga4_report_by_day(
+            client,
+            property_id,
+            request_body,
+            resolve_ga4_date(start_date, today),
+            resolve_ga4_date(end_date, today),
+            page_size=page_size,
+            max_in_flight=max_in_flight
+        )
         
         logger.info(f"GA4 datos obtenidos: {len(df)} filas")
         return df
@@ -538,11 +1999,289 @@ def get_ga4_data(property_id, credentials_file, start_date="7daysAgo", end_date=
         
         return None
 
-@st.cache_data(ttl=300)
+def resolve_ga4_date(value, today=None):
+    """
+    Convierte una fecha en formato GA4 ('today', 'yesterday', 'NdaysAgo',
+    'YYYY-MM-DD') o un date/datetime a datetime.date.
+    today: día actual en la zona de la propiedad (ver ga4_property_now); por
+    defecto, el del servidor
+    """
+    today = today or datetime.now().date()
+    if isinstance(value, datetime):
+        return value.date()
+    if hasattr(value, 'year') and hasattr(value, 'month') and hasattr(value, 'day'):
+        return value
+    if value == 'today':
+        return today
+    if value == 'yesterday':
+        return today - timedelta(days=1)
+    if value.endswith('daysAgo'):
+        return today - timedelta(days=int(value.replace('daysAgo', '')))
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def plan_ga4_date_ranges(date_ranges, today=None):
+    """
+    Fusiona rangos de fechas solapados o contiguos en el mínimo de rangos.
+    
+    Args:
+        date_ranges: Lista de tuplas (start, end) en cualquier formato de resolve_ga4_date
+        today: Día actual en la zona de la propiedad (ver resolve_ga4_date)
+    
+    Returns:
+        Lista ordenada de tuplas (start, end) como datetime.date, sin solapamientos
+    """
+    resolved = sorted(
+        (resolve_ga4_date(start, today), resolve_ga4_date(end, today)) for start, end in date_ranges
+    )
+    
+    merged = []
+    for start, end in resolved:
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def get_ga4_data_planned(property_id, credentials_file, date_ranges):
+    """
+    Sirve varios rangos del reporte pagePath x date con el mínimo de requests a GA4.
+    
+    Los rangos que pide cada sección del dashboard se fusionan con
+    plan_ga4_date_ranges, cada rango fusionado se pide una sola vez con
+    get_ga4_data y cada sección recibe un corte local por fecha. Como las
+    filas son por (pagePath, date), el corte es idéntico a pedir el rango solo.
+    
+    Args:
+        property_id: ID de la propiedad GA4
+        credentials_file: Archivo de credenciales
+        date_ranges: Lista de tuplas (start_date, end_date) en formato GA4
+    
+    Returns:
+        dict {(start_date, end_date): DataFrame o None} con una entrada por rango pedido
+    """
+    # Las fechas relativas se resuelven una sola vez, en la zona de la propiedad
+    today = ga4_property_now(property_id).date()
+    plan = plan_ga4_date_ranges(date_ranges, today)
+    logger.info(f"GA4 property {property_id}: {len(set(date_ranges))} rangos servidos con {len(plan)} requests")
+    
+    cubes = []
+    for start, end in plan:
+        cube = get_ga4_data(
+            property_id,
+            credentials_file,
+            start_date=start.strftime('%Y-%m-%d'),
+            end_date=end.strftime('%Y-%m-%d')
+        )
+        cubes.append((start, end, cube))
+    
+    frames = {}
+    for start_param, end_param in date_ranges:
+        start = resolve_ga4_date(start_param, today)
+        end = resolve_ga4_date(end_param, today)
+        frame = None
+        for cube_start, cube_end, cube in cubes:
+            if cube_start <= start and end <= cube_end:
+                if cube is not None and not cube.empty and 'date' in cube.columns:
+                    dates = cube['date'].dt.date
+                    frame = cube[(dates >= start) & (dates <= end)].reset_index(drop=True)
+                else:
+                    frame = cube
+                break
+        frames[(start_param, end_param)] = frame
+    return frames
+
+def _is_sheet_date_column(name):
+    return SHEET_SCHEMA.get(name) == 'datetime' or 'date' in str(name).lower() or 'fecha' in str(name).lower()
+
+def _parse_sheet_dates(values):
+    """
+    Convierte una columna de fechas del Sheet a datetime64. Hay pocas fechas
+    de publicación distintas: se parsean solo los valores únicos. Los números
+    son seriales de Sheets (días desde SHEET_SERIAL_EPOCH, como los devuelve
+    la API con SERIAL_NUMBER) y se convierten con aritmética; el texto se parsea.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    is_serial = uniques.map(lambda value: isinstance(value, (int, float)) and not isinstance(value, bool))
+    parsed = pd.to_datetime(uniques.where(~is_serial), errors='coerce')
+    if is_serial.any():
+        serials = pd.to_numeric(uniques[is_serial])
+        parsed[is_serial] = SHEET_SERIAL_EPOCH + pd.to_timedelta(serials, unit='D')
+    parsed = pd.DatetimeIndex(parsed)
+    # Último elemento: destino de los códigos -1 (celdas vacías)
+    return pd.Series(parsed.insert(len(parsed), pd.NaT).take(codes), index=values.index, name=values.name)
+
+def _apply_sheet_schema(df):
+    """
+    Tipa las columnas del Sheet según SHEET_SCHEMA. Las columnas que ya
+    tienen su tipo no se tocan, así que aplicarlo dos veces no cuesta nada.
+    Devuelve un DataFrame nuevo (no modifica df).
+    """
+    typed = {}
+    for col in df.columns:
+        kind = SHEET_SCHEMA.get(col)
+        if kind is None and _is_sheet_date_column(col):
+            kind = 'datetime'
+        try:
+            if kind == 'datetime' and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                typed[col] = _parse_sheet_dates(df[col])
+            elif kind == 'category' and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                typed[col] = df[col].astype('category')
+        except Exception as e:
+            logger.warning(f"No se pudo tipar la columna {col} del Sheet: {e}")
+    return df.assign(**typed) if typed else df
+
+def _hash_sheet_rows(rows):
+    """
+    Hash del contenido crudo de filas del Sheet (lista de listas de la API)
+    """
+    return hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _sheet_column_letter(index):
+    """
+    Letra A1 de una columna (0 -> A, 25 -> Z, 26 -> AA)
+    """
+    letters = ''
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(ord('A') + rest) + letters
+    return letters
+
+def _resolve_sheet_columns(header):
+    """
+    Columnas del Sheet que se leen, como [letra, nombre], a partir de los
+    encabezados: SHEET_COLUMNS, SHEET_SCHEMA y las de fecha. Si ninguna
+    coincide se leen todas.
+    """
+    columns = [
+        [_sheet_column_letter(i), name] for i, name in enumerate(header)
+        if name in SHEET_COLUMNS or name in SHEET_SCHEMA or _is_sheet_date_column(name)
+    ]
+    return columns or [[_sheet_column_letter(i), name] for i, name in enumerate(header)]
+
+def _batch_get_sheet_columns(service, spreadsheet_id, columns, first_row):
+    """
+    Lee las columnas pedidas desde first_row hasta el final, más la celda de
+    encabezado de cada una, con un solo values.batchGet. Los valores vienen
+    sin formato (UNFORMATTED_VALUE) y las fechas como serial (SERIAL_NUMBER).
+    
+    Returns:
+        Tupla (encabezados leídos, filas como lista de listas)
+    """
+    ranges = [f'{letter}1' for letter, _ in columns] + [f'{letter}{first_row}:{letter}' for letter, _ in columns]
+    result = service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=ranges,
+        majorDimension='COLUMNS',
+        valueRenderOption='UNFORMATTED_VALUE',
+        dateTimeRenderOption='SERIAL_NUMBER'
+    ).execute()
+    
+    # Cada rango es una sola columna: values = [[celdas...]] (vacío si no tiene datos)
+    column_values = [(value_range.get('values') or [[]])[0] for value_range in result.get('valueRanges', [])]
+    header = [values[0] if values else '' for values in column_values[:len(columns)]]
+    data = column_values[len(columns):]
+    # La API recorta cada columna en su última celda con datos: se completan con None
+    n_rows = max((len(values) for values in data), default=0)
+    rows = [[values[i] if i < len(values) else None for values in data] for i in range(n_rows)]
+    return header, rows
+
+def _sheet_rows_to_frame(columns, rows):
+    """
+    Arma el DataFrame tipado de filas leídas con _batch_get_sheet_columns.
+    Sin formato, un título o autor numérico llega como número: las columnas
+    de texto se pasan a str.
+    """
+    df = pd.DataFrame(rows, columns=[name for _, name in columns], dtype=object)
+    for _, name in columns:
+        if _is_sheet_date_column(name):
+            continue
+        df[name] = df[name].map(lambda value: value if value is None or isinstance(value, str) else str(value))
+    return _apply_sheet_schema(df)
+
+def _sync_google_sheet(service, spreadsheet_id):
+    """
+    Sincroniza el Google Sheet contra la copia tipada que queda en disco.
+    
+    Solo se leen las columnas que usan los dashboards: se resuelven una vez
+    a partir de los encabezados (_resolve_sheet_columns) y se piden juntas
+    con values.batchGet, sin formato y con las fechas como serial.
+    
+    La redacción casi siempre agrega filas al final, así que mientras la copia
+    en disco tenga menos de SHEET_FULL_SYNC_INTERVAL segundos desde la última
+    bajada completa solo se piden las filas desde las últimas
+    SHEET_SYNC_TAIL_ROWS ya sincronizadas. Si los encabezados o el hash de
+    esas filas cambiaron (ediciones o borrados al final) se baja el Sheet
+    completo; si no, las filas nuevas se parsean y se agregan a la copia.
+    
+    Returns:
+        Tupla (DataFrame, meta de sincronización) o (None, None) si el Sheet está vacío
+    """
+    now = datetime.now().timestamp()
+    previous = disk_cache_get('sheets/main')
+    
+    if previous is not None:
+        base_df, meta = previous
+        synced_rows = meta.get('synced_rows')
+        columns = meta.get('columns')
+        if columns and synced_rows is not None and now - meta.get('full_sync_at', 0) < SHEET_FULL_SYNC_INTERVAL:
+            overlap = min(SHEET_SYNC_TAIL_ROWS, synced_rows)
+            first_row = synced_rows - overlap + 2  # la fila 1 son los encabezados
+            header, rows = _batch_get_sheet_columns(service, spreadsheet_id, columns, first_row)
+            
+            if (header == [name for _, name in columns] and len(rows) >= overlap
+                    and _hash_sheet_rows(rows[:overlap]) == meta.get('tail_hash')):
+                new_rows = rows[overlap:]
+                df = base_df
+                if new_rows:
+                    new_df = _sheet_rows_to_frame(columns, new_rows)
+                    # Las categorías de las filas nuevas no son las mismas: se unifican
+                    df = _apply_sheet_schema(pd.concat([base_df, new_df], ignore_index=True))
+                logger.info(f"Google Sheet sincronizado: {len(new_rows)} filas nuevas")
+                return df, dict(
+                    meta,
+                    synced_rows=synced_rows + len(new_rows),
+                    tail_hash=_hash_sheet_rows(rows[-SHEET_SYNC_TAIL_ROWS:])
+                )
+            logger.info("Google Sheet modificado fuera de las filas nuevas: se baja completo")
+    
+    # Bajada completa: encabezados y después solo las columnas necesarias
+    result = service.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id,
+        range='A1:Z1'  # Primera fila como headers
+    ).execute()
+    
+    header = (result.get('values') or [[]])[0]
+    if not header:
+        return None, None
+    
+    columns = _resolve_sheet_columns(header)
+    _, rows = _batch_get_sheet_columns(service, spreadsheet_id, columns, 2)
+    logger.info(f"Google Sheet: {len(columns)} de {len(header)} columnas leídas")
+    
+    df = _sheet_rows_to_frame(columns, rows)
+    return df, {
+        'columns': columns,
+        'synced_rows': len(rows),
+        'tail_hash': _hash_sheet_rows(rows[-SHEET_SYNC_TAIL_ROWS:]),
+        'full_sync_at': now
+    }
+
 def load_google_sheet_data():
     """
     Carga los datos del Google Sheet privado usando cuenta de servicio con impersonación
+    Si hay una copia en disco de menos de SHEET_CACHE_TTL segundos se usa esa
+    
+    No tiene caché en memoria propio: lo cachea load_sheet_partitions, así
+    cada refresh de las particiones lee el Sheet y no una copia vencida.
     """
+    # Copia en disco todavía vigente (p. ej. tras un reinicio del proceso)
+    cached = disk_cache_get('sheets/main', max_age=SHEET_CACHE_TTL)
+    if cached is not None:
+        logger.info(f"Google Sheet cargado desde caché en disco: {len(cached[0])} filas")
+        return cached[0]
+    
     try:
         from google.oauth2 import service_account
         from googleapiclient.discovery import build
@@ -586,37 +2325,21 @@ def load_google_sheet_data():
             # Crear cliente de Google Sheets
             service = build('sheets', 'v4', credentials=credentials)
             
-            # Leer datos del sheet
-            result = service.spreadsheets().values().get(
-                spreadsheetId=spreadsheet_id,
-                range='A:Z'  # Leer todas las columnas
-            ).execute()
-            
-            values = result.get('values', [])
-            if not values:
+            # Leer datos del sheet (solo las filas nuevas si la copia en disco sigue vigente)
+            df, sync_meta = _sync_google_sheet(service, spreadsheet_id)
+            if df is None:
                 logger.warning("No se encontraron datos en el Google Sheet")
                 return pd.DataFrame()
             
-            # Convertir a DataFrame
-            df = pd.DataFrame(values[1:], columns=values[0])  # Primera fila como headers
-            
         else:
             # Fallback al método público anterior
             spreadsheet_id = '1n-jYrNH_S_uLzhCJhTzLfEJn_nnrsU2H5jkxNjtwO6Q'
             public_url = f'https://docs.google.com/spreadsheets/d/{spreadsheet_id}/export?format=csv'
-            df = pd.read_csv(public_url)
-        
-        # Procesar fechas si existen
-        date_columns = [col for col in df.columns if 'date' in col.lower() or 'fecha' in col.lower()]
-        for col in date_columns:
-            try:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-                # Formatear fechas como dd/mm/yyyy para mostrar
-                df[f"{col}_formatted"] = df[col].dt.strftime('%d/%m/%Y')
-            except:
-                pass
+            df = _apply_sheet_schema(pd.read_csv(public_url))
+            sync_meta = None
         
         logger.info(f"Google Sheet cargado: {len(df)} filas")
+        disk_cache_put('sheets/main', df, sync_meta)
         return df
         
     except Exception as e:
@@ -624,6 +2347,118 @@ def load_google_sheet_data():
         st.error(f"Error al cargar el spreadsheet: {str(e)}")
         return None
 
+# Host de una URL del Sheet: sin protocolo ni www
+_URL_HOST_RE = r'^\s*(?:[a-z][a-z0-9+.-]*://)?(?:www\.)?([^/?#\s]*)'
+
+def partition_sheet_by_medio(sheets_df, media_configs):
+    """
+    Parte el Google Sheet por medio.
+    
+    El host de cada URL (sin protocolo ni www) se extrae una sola vez con
+    _URL_HOST_RE (columna url_domain) y cada medio se queda con las filas
+    cuyo host contiene su dominio como texto literal (así
+    'nationalgeographic' toma todas sus variantes). La comparación se hace
+    por host distinto, no por fila.
+    
+    No es la regla de filter_media_urls, que busca el dominio (como regex) en
+    toda la URL: acá una URL de otro sitio que menciona el dominio en el path
+    o el query string no entra en la partición de ese medio. Cada partición
+    sale con url_id (el id de su URL normalizada, ver encode_urls) ya
+    calculado para el merge con GA4; el string se recupera con decode_urls
+    solo al mostrarlo.
+    
+    Args:
+        sheets_df: DataFrame completo del Google Sheet
+        media_configs: dict {medio: config} de create_media_config
+    
+    Returns:
+        dict {medio: DataFrame} (vacío para los medios sin filas)
+    """
+    if sheets_df is None or sheets_df.empty:
+        return {medio: pd.DataFrame() for medio in media_configs}
+
+    # Buscar columna de URL con nombres alternativos
+    url_column = None
+    possible_url_columns = ['url', 'URL', 'link', 'Link', 'enlace', 'Enlace']
+
+    for col_name in possible_url_columns:
+        if col_name in sheets_df.columns:
+            url_column = col_name
+            break
+
+    if url_column is None:
+        logger.warning(f"No se encontró columna de URL. Columnas disponibles: {sheets_df.columns.tolist()}")
+        return {medio: pd.DataFrame() for medio in media_configs}
+
+    url_domain = (
+        sheets_df[url_column].astype(str)
+        .str.extract(_URL_HOST_RE, flags=re.IGNORECASE, expand=False)
+        .str.lower()
+    )
+    sheets_df = sheets_df.assign(url_domain=url_domain)
+    codes, domains = pd.factorize(url_domain)
+
+    partitions = {}
+    for medio, media_config in media_configs.items():
+        domain = media_config['domain'].lower()
+        # Último elemento: destino de los códigos -1 (URLs sin dominio)
+        matches = np.array([domain in value for value in domains] + [False], dtype=bool)
+        partition = sheets_df[matches.take(codes)]
+        partitions[medio] = partition.assign(url_id=encode_urls(normalize_url_series(partition[url_column])))
+        logger.info(f"Partición del Sheet para {medio}: {len(partition)} URLs")
+    return partitions
+
+@loader_cache(ttl=SHEET_CACHE_TTL, scope='sheet', max_stale=LOADER_MAX_STALE)
+def load_sheet_partitions():
+    """
+    Google Sheet partido por medio (ver partition_sheet_by_medio). Se arma una
+    vez por carga del Sheet y lo comparten todas las páginas. Es la única capa
+    en memoria del Sheet: cada refresh vuelve a leerlo (o toma la copia en
+    disco si tiene menos de SHEET_CACHE_TTL segundos, p. ej. tras un reinicio).
+    
+    El conjunto de URLs de cada partición se registra acá, una sola vez por
+    carga, y su handle queda en partition.attrs['url_set'] (ver
+    get_sheet_partition_url_set).
+    """
+    sheets_df = load_google_sheet_data()
+    if sheets_df is None:
+        return None
+    partitions = partition_sheet_by_medio(sheets_df, create_media_config())
+    for partition in partitions.values():
+        if not partition.empty and 'url_id' in partition.columns:
+            partition.attrs['url_set'] = register_url_set(partition['url_id'].to_numpy())
+    return partitions
+
+def get_sheet_partition(medio):
+    """
+    Filas del Google Sheet de un medio, ya normalizadas. DataFrame vacío si
+    el Sheet no se pudo cargar o el medio no tiene URLs.
+    """
+    partitions = load_sheet_partitions()
+    if not partitions or medio not in partitions:
+        return pd.DataFrame()
+    return partitions[medio]
+
+def get_sheet_partition_url_set(partition):
+    """
+    Handle del conjunto de URLs de una partición del Sheet, el que se
+    registró al armarla (ver load_sheet_partitions). Si ya no está en el
+    registro (p. ej. la partición es de una carga anterior del Sheet que
+    guardó un fragment) se vuelve a registrar desde la partición.
+    
+    Returns:
+        Handle del conjunto, o None si la partición no tiene URLs
+    """
+    if partition is None or partition.empty or 'url_id' not in partition.columns:
+        return None
+    handle = partition.attrs.get('url_set')
+    if handle is not None:
+        with _URL_SETS_LOCK:
+            if handle in _URL_SETS:
+                _URL_SETS.move_to_end(handle)
+                return handle
+    return register_url_set(partition['url_id'].to_numpy())
+
 def filter_media_urls(df, domain):
     """
     Filtra un DataFrame para incluir solo URLs de un dominio específico
@@ -657,9 +2492,6 @@ def merge_sheets_with_ga4(sheets_df, ga4_df, domain):
     if sheets_df is None or sheets_df.empty or ga4_df is None or ga4_df.empty:
         return pd.DataFrame()
 
-    # Hacer una copia para no modificar el original
-    sheets_df = sheets_df.copy()
-
     # Buscar columna de URL con nombres alternativos
     url_column = None
     possible_url_columns = ['url', 'URL', 'link', 'Link', 'enlace', 'Enlace']
@@ -677,17 +2509,21 @@ def merge_sheets_with_ga4(sheets_df, ga4_df, domain):
         logger.warning(f"Columnas disponibles en sheet: {sheets_df.columns.tolist()}")
         return pd.DataFrame()
 
-    # Crear columna de URL normalizada usando la columna encontrada
+    # Id entero de la URL normalizada (columna encontrada, sin modificar el original)
+    # en el diccionario de URLs, que es la clave del merge.
+    # Las particiones de load_sheet_partitions ya lo traen calculado
     try:
-        sheets_df['url_normalized'] = sheets_df[url_column].apply(normalize_url)
-        logger.info(f"URLs normalizadas creadas: {len(sheets_df)} filas")
+        if 'url_id' not in sheets_df.columns:
+            sheets_df = sheets_df.assign(url_id=encode_urls(normalize_url_series(sheets_df[url_column])))
+            logger.info(f"URLs normalizadas creadas: {len(sheets_df)} filas")
     except Exception as e:
         logger.error(f"Error normalizando URLs del sheet: {e}")
         return pd.DataFrame()
     
-    # Normalizar pagePath de GA4 
+    # Normalizar pagePath de GA4 (los frames de GA4 vienen del caché: no se modifican).
+    # Solo se buscan ids: las URLs que no están en ningún Sheet quedan en -1
     try:
-        ga4_df['url_normalized'] = ga4_df['pagePath'].apply(lambda x: normalize_url(f"{domain}{x}"))
+        ga4_url_ids = encode_urls(normalize_url_series(ga4_df['pagePath'], domain), add=False)
     except Exception as e:
         logger.error(f"Error normalizando URLs de GA4: {e}")
         return pd.DataFrame()
@@ -706,32 +2542,31 @@ def merge_sheets_with_ga4(sheets_df, ga4_df, domain):
     mean_columns = ['averageSessionDuration', 'bounceRate', 'engagementRate']
     for col in mean_columns:
         if col in ga4_df.columns:
-            # Convertir a numérico, reemplazando errores con NaN
-            ga4_df[col] = pd.to_numeric(ga4_df[col], errors='coerce')
             agg_dict[col] = 'mean'
     
-    ga4_grouped = ga4_df.groupby('url_normalized').agg(agg_dict).reset_index()
+    # Las filas de GA4 sin id no pueden matchear ninguna URL del Sheet (merge left):
+    # se descartan antes de agrupar
+    in_sheet = ga4_url_ids >= 0
+    ga4_metrics = ga4_df.loc[in_sheet, list(agg_dict)]
+    # Convertir a numérico, reemplazando errores con NaN
+    ga4_metrics = ga4_metrics.assign(**{
+        col: pd.to_numeric(ga4_metrics[col], errors='coerce')
+        for col, func in agg_dict.items() if func == 'mean'
+    })
+    url_id = pd.Series(ga4_url_ids[in_sheet], index=ga4_metrics.index, name='url_id')
+    ga4_grouped = ga4_metrics.groupby(url_id).agg(agg_dict).reset_index()
     
-    # Hacer el merge
+    # Hacer el merge sobre el id entero de la URL
     merged_df = sheets_df.merge(
         ga4_grouped,
-        on='url_normalized',
+        on='url_id',
         how='left',
         suffixes=('', '_ga4')
     )
     
-    # Formatear fechas de publicación
-    date_columns = ['datePub', 'fecha_publicacion', 'fecha', 'date']
-    for col in date_columns:
-        if col in merged_df.columns:
-            try:
-                # Convertir a datetime si no lo está ya
-                merged_df[col] = pd.to_datetime(merged_df[col], errors='coerce')
-                # Formatear como dd/mm/yyyy
-                merged_df[col] = merged_df[col].dt.strftime('%d/%m/%Y')
-            except Exception as e:
-                logger.warning(f"Error formateando fecha en columna {col}: {e}")
-                continue
+    # Fechas de publicación como datetime y autor como category (no-op si el
+    # Sheet ya viene tipado); el formato dd/mm/yyyy queda para la vista
+    merged_df = _apply_sheet_schema(merged_df)
     
     # Llenar NaN con 0 para métricas
     metric_columns = ['sessions', 'totalUsers', 'screenPageViews', 
@@ -743,68 +2578,15 @@ def merge_sheets_with_ga4(sheets_df, ga4_df, domain):
     logger.info(f"Merge completado: {len(merged_df)} filas con datos combinados")
     return merged_df
 
-@st.cache_data(ttl=300)
-def get_monthly_pageviews_by_sheets(property_id, credentials_file, sheets_urls, domain):
-    """
-    Obtiene pageviews del mes actual solo para URLs que están en el Google Sheets
-    
-    Args:
-        property_id: ID de la propiedad GA4
-        credentials_file: Archivo de credenciales
-        sheets_urls: Lista de URLs normalizadas del Google Sheet
-        domain: Dominio del medio
-    
-    Returns:
-        int: Total de pageviews del mes para URLs del Sheet
-    """
-    try:
-        from datetime import datetime
-        
-        # Mes actual - obtener como strings para get_ga4_data
-        current_month_start = datetime.now().replace(day=1).strftime('%Y-%m-%d')
-        current_month_today = datetime.now().strftime('%Y-%m-%d')
-        
-        # Usar el mismo approach que funciona en el KPI
-        # Obtener datos de GA4 para el mes actual
-        ga4_monthly_df = get_ga4_data(
-            property_id,
-            credentials_file,
-            start_date=current_month_start,
-            end_date=current_month_today
-        )
-        
-        if ga4_monthly_df is not None and not ga4_monthly_df.empty and sheets_urls:
-            # Normalizar URLs de GA4
-            ga4_monthly_df['url_normalized'] = ga4_monthly_df['pagePath'].apply(
-                lambda x: normalize_url(f"{domain}{x}")
-            )
-
-            # Filtrar solo las URLs que están en sheets_urls (matching exacto)
-            filtered_df = ga4_monthly_df[ga4_monthly_df['url_normalized'].isin(sheets_urls)]
-
-            if not filtered_df.empty and 'screenPageViews' in filtered_df.columns:
-                result = int(filtered_df['screenPageViews'].sum())
-                logger.info(f"Pageviews mensuales calculados: {result} de {len(filtered_df)} URLs")
-                return result
-            else:
-                return 0
-        else:
-            return 0
-            
-    except Exception as e:
-        logger.error(f"Error obteniendo pageviews mensuales: {e}")
-        return 0
-
-@st.cache_data(ttl=300)
+@loader_cache(ttl=300, scope_arg='property_id', max_stale=LOADER_MAX_STALE)
 def get_ga4_pageviews_data(property_id, credentials_file, period="month"):
     """
     Obtiene datos de pageviews para el período especificado
     period: "month" (mes actual), "week" (última semana), "total" (últimos 90 días)
     """
     try:
-        # Determinar fechas según el período
-        from datetime import datetime, timedelta
-        today = datetime.now()
+        # Determinar fechas según el período (en la zona de la propiedad)
+        today = ga4_property_now(property_id)
         
         if period == "month":
             # Mes actual
@@ -820,38 +2602,13 @@ def get_ga4_pageviews_data(property_id, credentials_file, period="month"):
             end_date = today.strftime("%Y-%m-%d")
         
         # Determinar qué tipo de cuenta usar
-        if property_id == "255037852":  # OK Diario
-            account_type = "acceso_medios"
-        elif credentials_file == "damian_credentials_analytics_2025.json":  # Mundo Deportivo
-            account_type = "damian"
-        else:
-            account_type = "acceso"
+        account_type = _resolve_ga4_account_type(property_id, credentials_file)
         
-        # Usar Streamlit secrets
-        if hasattr(st, 'secrets'):
-            secret_key = f'google_oauth_{account_type}'
-            if secret_key in st.secrets:
-                credentials_data = st.secrets[secret_key]
-                credentials_dict = dict(credentials_data)
-            else:
-                return None
-        else:
+        # Cliente compartido del proceso
+        client = get_ga4_client(account_type)
+        if not client:
             return None
         
-        # Crear cliente
-        from google.oauth2.credentials import Credentials
-        from googleapiclient.discovery import build
-        
-        creds = Credentials(
-            token=credentials_dict.get('token'),
-            refresh_token=credentials_dict.get('refresh_token'),
-            client_id=credentials_dict.get('client_id'),
-            client_secret=credentials_dict.get('client_secret'),
-            token_uri="https://oauth2.googleapis.com/token"
-        )
-        
-        client = build('analyticsdata', 'v1beta', credentials=creds)
-        
         # Request para pageviews totales y por página (excluyendo home)
         request_body = {
             'dimensions': [
@@ -860,31 +2617,24 @@ def get_ga4_pageviews_data(property_id, credentials_file, period="month"):
             'metrics': [
                 {'name': 'screenPageViews'}
             ],
-            'dateRanges': [{'startDate': start_date, 'endDate': end_date}],
-            'limit': 100000
+            'dateRanges': [{'startDate': start_date, 'endDate': end_date}]
         }
         
-        response = client.properties().runReport(
-            property=f"properties/{property_id}", 
-            body=request_body
-        ).execute()
+        # Paginado y decodificado por columnas (sin tope de filas)
+        df = run_ga4_report(client, property_id, request_body)
         
         # Procesar respuesta
         total_pageviews = 0
         non_home_pageviews = 0
         non_home_pages = 0
         
-        if 'rows' in response:
-            for row in response['rows']:
-                page_path = row['dimensionValues'][0]['value']
-                pageviews = int(row['metricValues'][0]['value'])
-                
-                total_pageviews += pageviews
-                
-                # Excluir home (/, /index, etc.)
-                if page_path not in ['/', '/index', '/index.html', '/home']:
-                    non_home_pageviews += pageviews
-                    non_home_pages += 1
+        if not df.empty:
+            total_pageviews = int(df['screenPageViews'].sum())
+            
+            # Excluir home (/, /index, etc.)
+            non_home = df.loc[~df['pagePath'].isin(['/', '/index', '/index.html', '/home']), 'screenPageViews']
+            non_home_pageviews = int(non_home.sum())
+            non_home_pages = len(non_home)
         
         avg_pageviews_per_page = non_home_pageviews / non_home_pages if non_home_pages > 0 else 0
         
@@ -912,6 +2662,7 @@ def create_media_config():
                     'name': 'Clarín',
                     'domain': 'clarin.com',
                     'property_id': ga_config.get('clarin_property_id', '287171418'),
+                    'timezone': ga_config.get('clarin_timezone', 'America/Argentina/Buenos_Aires'),
                     'icon': '📰',
                     'color': '#9b51e0'
                 },
@@ -919,6 +2670,7 @@ def create_media_config():
                     'name': 'Olé',
                     'domain': 'ole.com.ar',
                     'property_id': ga_config.get('ole_property_id', '151714594'),
+                    'timezone': ga_config.get('ole_timezone', 'America/Argentina/Buenos_Aires'),
                     'icon': '⚽',
                     'color': '#9b51e0'
                 },
@@ -926,6 +2678,7 @@ def create_media_config():
                     'name': 'OK Diario',
                     'domain': 'okdiario.com',
                     'property_id': ga_config.get('okdiario_property_id', '255037852'),
+                    'timezone': ga_config.get('okdiario_timezone', 'Europe/Madrid'),
                     'icon': '🗞️',
                     'color': '#9b51e0'
                 },
@@ -933,6 +2686,7 @@ def create_media_config():
                     'name': 'El Español',
                     'domain': 'elespanol.com',
                     'property_id': ga_config.get('elespanol_property_id', '000000000'),
+                    'timezone': ga_config.get('elespanol_timezone', 'Europe/Madrid'),
                     'icon': '🇪🇸',
                     'color': '#9b51e0'
                 },
@@ -940,6 +2694,7 @@ def create_media_config():
                     'name': 'National Geographic',
                     'domain': 'nationalgeographic',  # Buscar todas las variantes
                     'property_id': ga_config.get('natgeo_property_id', '000000000'),
+                    'timezone': ga_config.get('natgeo_timezone', 'Europe/Madrid'),
                     'icon': '🌍',
                     'color': '#9b51e0'
                 },
@@ -947,6 +2702,7 @@ def create_media_config():
                     'name': 'Mundo Deportivo',
                     'domain': 'mundodeportivo.com',
                     'property_id': ga_config.get('mundodeportivo_property_id', '000000000'),
+                    'timezone': ga_config.get('mundodeportivo_timezone', 'Europe/Madrid'),
                     'icon': '🏆',
                     'color': '#9b51e0'
                 },
@@ -954,6 +2710,7 @@ def create_media_config():
                     'name': 'Vidae',
                     'domain': 'vidae.com.ar',
                     'property_id': ga_config.get('vidae_property_id', '000000000'),
+                    'timezone': ga_config.get('vidae_timezone', 'America/Argentina/Buenos_Aires'),
                     'icon': '💫',
                     'color': '#9b51e0'
                 },
@@ -961,6 +2718,7 @@ def create_media_config():
                     'name': 'Bumeran',
                     'domain': 'bumeran.com.ar',
                     'property_id': ga_config.get('bumeran_property_id', '000000000'),
+                    'timezone': ga_config.get('bumeran_timezone', 'America/Argentina/Buenos_Aires'),
                     'icon': '💼',
                     'color': '#9b51e0'
                 },
@@ -968,6 +2726,7 @@ def create_media_config():
                     'name': 'Sancor',
                     'domain': 'sancorsalud.com.ar',
                     'property_id': ga_config.get('sancor_property_id', '000000000'),
+                    'timezone': ga_config.get('sancor_timezone', 'America/Argentina/Buenos_Aires'),
                     'icon': '🏥',
                     'color': '#9b51e0'
                 }
@@ -981,6 +2740,7 @@ def create_media_config():
             'name': 'Clarín',
             'domain': 'clarin.com',
             'property_id': '287171418',
+            'timezone': 'America/Argentina/Buenos_Aires',
             'icon': '📰',
             'color': '#9b51e0'
         },
@@ -988,6 +2748,7 @@ def create_media_config():
             'name': 'Olé',
             'domain': 'ole.com.ar',
             'property_id': '151714594',
+            'timezone': 'America/Argentina/Buenos_Aires',
             'icon': '⚽',
             'color': '#9b51e0'
         },
@@ -995,6 +2756,7 @@ def create_media_config():
             'name': 'OK Diario',
             'domain': 'okdiario.com',
             'property_id': '255037852',
+            'timezone': 'Europe/Madrid',
             'icon': '🗞️',
             'color': '#9b51e0'
         },
@@ -1002,6 +2764,7 @@ def create_media_config():
             'name': 'El Español',
             'domain': 'elespanol.com',
             'property_id': '000000000',
+            'timezone': 'Europe/Madrid',
             'icon': '🇪🇸',
             'color': '#9b51e0'
         },
@@ -1009,6 +2772,7 @@ def create_media_config():
             'name': 'National Geographic',
             'domain': 'nationalgeographic',  # Buscar todas las variantes
             'property_id': '000000000',
+            'timezone': 'Europe/Madrid',
             'icon': '🌍',
             'color': '#9b51e0'
         },
@@ -1016,6 +2780,7 @@ def create_media_config():
             'name': 'Mundo Deportivo',
             'domain': 'mundodeportivo.com',
             'property_id': '416839948',
+            'timezone': 'Europe/Madrid',
             'icon': '🏆',
             'color': '#9b51e0'
         },
@@ -1023,6 +2788,7 @@ def create_media_config():
             'name': 'Vidae',
             'domain': 'vidae.com.ar',
             'property_id': '000000000',
+            'timezone': 'America/Argentina/Buenos_Aires',
             'icon': '💫',
             'color': '#9b51e0'
         },
@@ -1030,6 +2796,7 @@ def create_media_config():
             'name': 'Bumeran',
             'domain': 'bumeran.com.ar',
             'property_id': '000000000',
+            'timezone': 'America/Argentina/Buenos_Aires',
             'icon': '💼',
             'color': '#9b51e0'
         },
@@ -1037,45 +2804,133 @@ def create_media_config():
             'name': 'Sancor',
             'domain': 'sancorsalud.com.ar',
             'property_id': '000000000',
+            'timezone': 'America/Argentina/Buenos_Aires',
             'icon': '🏥',
             'color': '#9b51e0'
         }
     }
 
-@st.cache_data(ttl=300)
-def get_ga4_growth_data(property_id, credentials_file, comparison_type="day", sheets_urls=None):
+def _calculate_growth(current_data, previous_data):
     """
-    Obtiene datos de crecimiento comparando períodos t vs t-1, filtrando solo URLs del Sheet
-    comparison_type: "day", "week", "month", "90days", "custom"
-    sheets_urls: Lista de URLs normalizadas del Google Sheet para filtrar
+    Calcula el crecimiento absoluto y porcentual de cada métrica entre dos períodos
     """
-    from datetime import datetime, timedelta
+    growth_data = {}
+    for metric in ['pageviews', 'sessions', 'users']:
+        current_value = current_data[metric]
+        previous_value = previous_data[metric]
+        
+        if previous_value > 0:
+            growth_percentage = ((current_value - previous_value) / previous_value) * 100
+        elif previous_value == 0 and current_value > 0:
+            growth_percentage = float('inf')  # Crecimiento infinito (desde 0)
+        elif previous_value == 0 and current_value == 0:
+            growth_percentage = 0  # Sin cambio (ambos períodos en 0)
+        else:  # previous_value > 0 and current_value == 0
+            growth_percentage = -100  # Decrecimiento total
+        
+        growth_data[metric] = {
+            'current': current_value,
+            'previous': previous_value,
+            'growth_percentage': growth_percentage,
+            'growth_absolute': current_value - previous_value
+        }
     
-    try:
-        # Determinar qué tipo de cuenta usar según la propiedad
-        if property_id == "255037852":  # OK Diario usa acceso_medios
-            account_type = "acceso_medios"
-        elif credentials_file == "damian_credentials_analytics_2025.json":  # Mundo Deportivo usa damian
-            account_type = "damian"
-        else:  # Clarín y Olé usan acceso
-            account_type = "acceso"
-        
-        # Usar siempre Streamlit secrets
-        if hasattr(st, 'secrets'):
-            secret_key = f'google_oauth_{account_type}'
-            if secret_key in st.secrets:
-                logger.info(f"Usando credenciales {account_type} desde Streamlit secrets")
-                client = get_ga4_client_oauth(credentials_file, account_type)
-            else:
-                logger.error(f"No se encontró la sección {secret_key} en Streamlit secrets")
-                return None
+    return growth_data
+
+def _get_ga4_period_comparison(property_id, credentials_file, current_start, current_end,
+                               previous_start, previous_end, period_name, sheets_urls=None, domain=None):
+    """
+    Compara dos períodos con un único runReport, filtrando solo URLs del Sheet.
+
+    GA4 acepta varios dateRanges en el mismo request y devuelve la dimensión
+    'dateRange' con el nombre de cada rango, así que ambos períodos llegan en
+    un solo round trip y se separan localmente.
+    """
+    sheets_urls = get_sheet_url_index(sheets_urls)
+    
+    # Determinar qué tipo de cuenta usar según la propiedad
+    account_type = _resolve_ga4_account_type(property_id, credentials_file)
+    
+    # Usar siempre Streamlit secrets
+    if hasattr(st, 'secrets'):
+        secret_key = f'google_oauth_{account_type}'
+        if secret_key in st.secrets:
+            logger.info(f"Usando credenciales {account_type} desde Streamlit secrets")
+            client = get_ga4_client(account_type)
         else:
+            logger.error(f"No se encontró la sección {secret_key} en Streamlit secrets")
             return None
-        
-        if not client:
-            return None
-        
-        today = datetime.now()
+    else:
+        return None
+    
+    if not client:
+        return None
+    
+    request_body = {
+        'dimensions': [
+            {'name': 'pagePath'}
+        ],
+        'metrics': [
+            {'name': 'screenPageViews'},
+            {'name': 'sessions'},
+            {'name': 'totalUsers'}
+        ],
+        'dateRanges': [
+            {'startDate': current_start.strftime("%Y-%m-%d"),
+             'endDate': current_end.strftime("%Y-%m-%d"),
+             'name': 'current'},
+            {'startDate': previous_start.strftime("%Y-%m-%d"),
+             'endDate': previous_end.strftime("%Y-%m-%d"),
+             'name': 'previous'}
+        ]
+    }
+    
+    # Sin URLs del Sheet no hay nada que sumar
+    df = pd.DataFrame()
+    if sheets_urls:
+        df = _run_ga4_report_for_sheet(client, property_id, request_body, sheets_urls, domain)
+    
+    # Totales por período
+    totals = {
+        name: {'pageviews': 0, 'sessions': 0, 'users': 0}
+        for name in ('current', 'previous')
+    }
+    
+    if not df.empty and sheets_urls:
+        # Si tenemos URLs del Sheet, filtrar solo esas con match EXACTO
+        # sheets_urls ya están normalizadas
+        normalized_page_path = normalize_url_series(df['pagePath'], domain)
+        df = df[sheets_urls.contains(normalized_page_path)]
+        
+        summed = df.groupby('dateRange', observed=True)[['screenPageViews', 'sessions', 'totalUsers']].sum()
+        for name in totals:
+            if name in summed.index:
+                totals[name] = {
+                    'pageviews': int(summed.at[name, 'screenPageViews']),
+                    'sessions': int(summed.at[name, 'sessions']),
+                    'users': int(summed.at[name, 'totalUsers'])
+                }
+    
+    return {
+        'period_name': period_name,
+        'current_period': f"{current_start.strftime('%d/%m/%Y')} - {current_end.strftime('%d/%m/%Y')}",
+        'previous_period': f"{previous_start.strftime('%d/%m/%Y')} - {previous_end.strftime('%d/%m/%Y')}",
+        'data': _calculate_growth(totals['current'], totals['previous'])
+    }
+
+@loader_cache(ttl=300, scope_arg='property_id', max_stale=LOADER_MAX_STALE)
+def get_ga4_growth_data(property_id, credentials_file, comparison_type="day", sheets_urls=None, domain=None):
+    """
+    Obtiene datos de crecimiento comparando períodos t vs t-1, filtrando solo URLs del Sheet
+    comparison_type: "day", "week", "month", "90days", "custom"
+    sheets_urls: Lista de URLs normalizadas del Google Sheet para filtrar (handle de register_url_set o SheetUrlIndex)
+    domain: Dominio del medio para normalización de URLs
+    """
+    # Fuera del try: un handle desconocido se propaga y no se cachea
+    sheets_urls = get_sheet_url_index(sheets_urls)
+    try:
+        # Los períodos se cortan en la zona horaria de la propiedad, como los de GA4
+        today = ga4_property_now(property_id)
         
         # Definir períodos según el tipo de comparación
         if comparison_type == "day":
@@ -1111,223 +2966,103 @@ def get_ga4_growth_data(property_id, credentials_file, comparison_type="day", sh
         else:
             return None
         
-        # Función para obtener datos de un período
-        def get_period_data(start_date, end_date):
-            request_body = {
-                'dimensions': [
-                    {'name': 'pagePath'}
-                ],
-                'metrics': [
-                    {'name': 'screenPageViews'},
-                    {'name': 'sessions'},
-                    {'name': 'totalUsers'}
-                ],
-                'dateRanges': [{'startDate': start_date.strftime("%Y-%m-%d"), 
-                               'endDate': end_date.strftime("%Y-%m-%d")}],
-                'limit': 100000
-            }
-            
-            response = client.properties().runReport(
-                property=f"properties/{property_id}", 
-                body=request_body
-            ).execute()
-            
-            # Procesar respuesta
-            total_pageviews = 0
-            total_sessions = 0
-            total_users = 0
-            
-            if 'rows' in response and sheets_urls:
-                # Si tenemos URLs del Sheet, filtrar solo esas con match EXACTO
-                for row in response['rows']:
-                    page_path = row['dimensionValues'][0]['value']
-
-                    # Normalizar el pagePath para comparación exacta
-                    # sheets_urls ya están normalizadas
-                    normalized_page_path = normalize_url(page_path)
-
-                    # Buscar coincidencia EXACTA
-                    match_found = False
-                    for sheet_url in sheets_urls:
-                        if normalized_page_path == sheet_url:
-                            match_found = True
-                            break
-
-                    if match_found:
-                        pageviews = int(row['metricValues'][0]['value'])
-                        sessions = int(row['metricValues'][1]['value'])
-                        users = int(row['metricValues'][2]['value'])
-
-                        total_pageviews += pageviews
-                        total_sessions += sessions
-                        total_users += users
-            
-            return {
-                'pageviews': total_pageviews,
-                'sessions': total_sessions,
-                'users': total_users
-            }
-        
-        # Obtener datos de ambos períodos
-        current_data = get_period_data(current_start, current_end)
-        previous_data = get_period_data(previous_start, previous_end)
-        
-        # Calcular crecimiento
-        growth_data = {}
-        for metric in ['pageviews', 'sessions', 'users']:
-            current_value = current_data[metric]
-            previous_value = previous_data[metric]
-            
-            if previous_value > 0:
-                growth_percentage = ((current_value - previous_value) / previous_value) * 100
-            elif previous_value == 0 and current_value > 0:
-                growth_percentage = float('inf')  # Crecimiento infinito (desde 0)
-            elif previous_value == 0 and current_value == 0:
-                growth_percentage = 0  # Sin cambio (ambos períodos en 0)
-            else:  # previous_value > 0 and current_value == 0
-                growth_percentage = -100  # Decrecimiento total
-            
-            growth_data[metric] = {
-                'current': current_value,
-                'previous': previous_value,
-                'growth_percentage': growth_percentage,
-                'growth_absolute': current_value - previous_value
-            }
-        
-        return {
-            'period_name': period_name,
-            'current_period': f"{current_start.strftime('%d/%m/%Y')} - {current_end.strftime('%d/%m/%Y')}",
-            'previous_period': f"{previous_start.strftime('%d/%m/%Y')} - {previous_end.strftime('%d/%m/%Y')}",
-            'data': growth_data
-        }
+        return _get_ga4_period_comparison(
+            property_id,
+            credentials_file,
+            current_start,
+            current_end,
+            previous_start,
+            previous_end,
+            period_name,
+            sheets_urls,
+            domain
+        )
         
     except Exception as e:
         logger.error(f"Error obteniendo datos de crecimiento: {e}")
         return None
 
-@st.cache_data(ttl=300)
-def get_ga4_growth_data_custom(property_id, credentials_file, current_start, current_end, previous_start, previous_end, sheets_urls=None):
+@loader_cache(ttl=300, scope_arg='property_id', max_stale=LOADER_MAX_STALE)
+def get_ga4_growth_data_custom(property_id, credentials_file, current_start, current_end, previous_start, previous_end, sheets_urls=None,
+                               domain=None):
     """
     Obtiene datos de crecimiento para períodos personalizados, filtrando solo URLs del Sheet
-    sheets_urls: Lista de URLs normalizadas del Google Sheet para filtrar
+    sheets_urls: Lista de URLs normalizadas del Google Sheet para filtrar (handle de register_url_set o SheetUrlIndex)
+    domain: Dominio del medio para normalización de URLs
     """
+    # Fuera del try: un handle desconocido se propaga y no se cachea
+    sheets_urls = get_sheet_url_index(sheets_urls)
     try:
-        # Determinar qué tipo de cuenta usar según la propiedad
-        if property_id == "255037852":  # OK Diario usa acceso_medios
-            account_type = "acceso_medios"
-        elif credentials_file == "damian_credentials_analytics_2025.json":  # Mundo Deportivo usa damian
-            account_type = "damian"
-        else:  # Clarín y Olé usan acceso
-            account_type = "acceso"
-        
-        # Usar siempre Streamlit secrets
-        if hasattr(st, 'secrets'):
-            secret_key = f'google_oauth_{account_type}'
-            if secret_key in st.secrets:
-                client = get_ga4_client_oauth(credentials_file, account_type)
-            else:
-                return None
-        else:
-            return None
-        
-        if not client:
-            return None
-        
-        # Función para obtener datos de un período
-        def get_period_data(start_date, end_date):
-            request_body = {
-                'dimensions': [
-                    {'name': 'pagePath'}
-                ],
-                'metrics': [
-                    {'name': 'screenPageViews'},
-                    {'name': 'sessions'},
-                    {'name': 'totalUsers'}
-                ],
-                'dateRanges': [{'startDate': start_date.strftime("%Y-%m-%d"), 
-                               'endDate': end_date.strftime("%Y-%m-%d")}],
-                'limit': 100000
-            }
-            
-            response = client.properties().runReport(
-                property=f"properties/{property_id}", 
-                body=request_body
-            ).execute()
-            
-            # Procesar respuesta
-            total_pageviews = 0
-            total_sessions = 0
-            total_users = 0
-            
-            if 'rows' in response and sheets_urls:
-                # Si tenemos URLs del Sheet, filtrar solo esas con match EXACTO
-                for row in response['rows']:
-                    page_path = row['dimensionValues'][0]['value']
-
-                    # Normalizar el pagePath para comparación exacta
-                    # sheets_urls ya están normalizadas
-                    normalized_page_path = normalize_url(page_path)
-
-                    # Buscar coincidencia EXACTA
-                    match_found = False
-                    for sheet_url in sheets_urls:
-                        if normalized_page_path == sheet_url:
-                            match_found = True
-                            break
-
-                    if match_found:
-                        pageviews = int(row['metricValues'][0]['value'])
-                        sessions = int(row['metricValues'][1]['value'])
-                        users = int(row['metricValues'][2]['value'])
-
-                        total_pageviews += pageviews
-                        total_sessions += sessions
-                        total_users += users
-            
-            return {
-                'pageviews': total_pageviews,
-                'sessions': total_sessions,
-                'users': total_users
-            }
-        
-        # Obtener datos de ambos períodos
-        current_data = get_period_data(current_start, current_end)
-        previous_data = get_period_data(previous_start, previous_end)
-        
-        # Calcular crecimiento
-        growth_data = {}
-        for metric in ['pageviews', 'sessions', 'users']:
-            current_value = current_data[metric]
-            previous_value = previous_data[metric]
-            
-            if previous_value > 0:
-                growth_percentage = ((current_value - previous_value) / previous_value) * 100
-            elif previous_value == 0 and current_value > 0:
-                growth_percentage = float('inf')  # Crecimiento infinito (desde 0)
-            elif previous_value == 0 and current_value == 0:
-                growth_percentage = 0  # Sin cambio (ambos períodos en 0)
-            else:  # previous_value > 0 and current_value == 0
-                growth_percentage = -100  # Decrecimiento total
-            
-            growth_data[metric] = {
-                'current': current_value,
-                'previous': previous_value,
-                'growth_percentage': growth_percentage,
-                'growth_absolute': current_value - previous_value
-            }
-        
-        return {
-            'period_name': 'Personalizado',
-            'current_period': f"{current_start.strftime('%d/%m/%Y')} - {current_end.strftime('%d/%m/%Y')}",
-            'previous_period': f"{previous_start.strftime('%d/%m/%Y')} - {previous_end.strftime('%d/%m/%Y')}",
-            'data': growth_data
-        }
+        return _get_ga4_period_comparison(
+            property_id,
+            credentials_file,
+            current_start,
+            current_end,
+            previous_start,
+            previous_end,
+            'Personalizado',
+            sheets_urls,
+            domain
+        )
         
     except Exception as e:
         logger.error(f"Error obteniendo datos de crecimiento personalizado: {e}")
         return None
 
-@st.cache_data(ttl=300)
+def build_historical_data(ga4_df, sheets_urls, domain=None, time_granularity="day"):
+    """
+    Arma el DataFrame histórico (por fecha y página) a partir de un reporte
+    pagePath x date de GA4, filtrando solo URLs del Sheet
+    
+    Args:
+        ga4_df: DataFrame de GA4 con pagePath, date, screenPageViews, sessions y totalUsers
+        sheets_urls: URLs normalizadas del Google Sheet (lista, handle o SheetUrlIndex)
+        domain: Dominio del medio para normalización de URLs
+        time_granularity: "day", "week", "month"
+    
+    Returns:
+        DataFrame con pagePath, url_normalized, date, pageviews, sessions, users y period
+    """
+    df = pd.DataFrame()
+    sheets_urls = get_sheet_url_index(sheets_urls)
+    if ga4_df is None or ga4_df.empty or not sheets_urls:
+        return df
+    
+    # Normalizar el pagePath de GA4 para comparar correctamente
+    normalized_page_path = normalize_url_series(ga4_df['pagePath'], domain)
+    
+    # Coincidencia EXACTA con URLs del Sheet
+    mask = sheets_urls.contains(normalized_page_path)
+    df = pd.DataFrame({
+        'pagePath': ga4_df.loc[mask, 'pagePath'],
+        'url_normalized': normalized_page_path[mask],
+        'date': ga4_df.loc[mask, 'date'],
+        'pageviews': ga4_df.loc[mask, 'screenPageViews'],
+        'sessions': ga4_df.loc[mask, 'sessions'],
+        'users': ga4_df.loc[mask, 'totalUsers']
+    })
+    # Los chunks del pushdown (o los cortes de un reporte mayor) no vienen ordenados por fecha
+    df = df.sort_values('date', kind='stable').reset_index(drop=True)
+    
+    logger.info(f"Final dataframe: {len(df)} rows after filtering")
+    
+    if not df.empty:
+        # Aplicar granularidad temporal
+        if time_granularity == "week":
+            df['period'] = df['date'].dt.to_period('W').dt.start_time
+            df['period_formatted'] = df['period'].dt.strftime('%d/%m/%Y')
+        elif time_granularity == "month":
+            df['period'] = df['date'].dt.to_period('M').dt.start_time
+            df['period_formatted'] = df['period'].dt.strftime('%d/%m/%Y')
+        else:  # day
+            df['period'] = df['date']
+            df['period_formatted'] = df['period'].dt.strftime('%d/%m/%Y')
+        
+        logger.info(f"Datos históricos obtenidos: {len(df)} filas, granularidad: {time_granularity}")
+    
+    return df
+
+@loader_cache(ttl=300, scope_arg='property_id', max_stale=LOADER_MAX_STALE)
 def get_ga4_historical_data(property_id, credentials_file, start_date, end_date, time_granularity="day", sheets_urls=None, domain=None):
     """
     Obtiene datos históricos de GA4 para análisis temporal, filtrando solo URLs del Sheet
@@ -1338,28 +3073,23 @@ def get_ga4_historical_data(property_id, credentials_file, start_date, end_date,
         start_date: Fecha de inicio (datetime)
         end_date: Fecha de fin (datetime)
         time_granularity: "day", "week", "month"
-        sheets_urls: Lista de URLs normalizadas del Google Sheet para filtrar
+        sheets_urls: Lista de URLs normalizadas del Google Sheet para filtrar (handle de register_url_set o SheetUrlIndex)
         domain: Dominio del medio para normalización de URLs
     
     Returns:
         DataFrame con datos históricos por fecha y página
     """
-    import pandas as pd
-    
+    # Fuera del try: un handle desconocido se propaga y no se cachea
+    sheets_urls = get_sheet_url_index(sheets_urls)
     try:
         # Determinar qué tipo de cuenta usar según la propiedad
-        if property_id == "255037852":  # OK Diario usa acceso_medios
-            account_type = "acceso_medios"
-        elif credentials_file == "damian_credentials_analytics_2025.json":  # Mundo Deportivo usa damian
-            account_type = "damian"
-        else:  # Clarín y Olé usan acceso
-            account_type = "acceso"
+        account_type = _resolve_ga4_account_type(property_id, credentials_file)
         
         # Usar siempre Streamlit secrets
         if hasattr(st, 'secrets'):
             secret_key = f'google_oauth_{account_type}'
             if secret_key in st.secrets:
-                client = get_ga4_client_oauth(credentials_file, account_type)
+                client = get_ga4_client(account_type)
             else:
                 return None
         else:
@@ -1384,75 +3114,188 @@ def get_ga4_historical_data(property_id, credentials_file, start_date, end_date,
             ],
             'dateRanges': [{'startDate': start_date.strftime("%Y-%m-%d"), 
                            'endDate': end_date.strftime("%Y-%m-%d")}],
-            'limit': 1000000,
             'orderBys': [{'dimension': {'dimensionName': 'date'}}]
         }
         
-        response = client.properties().runReport(
-            property=f"properties/{property_id}", 
-            body=request_body
-        ).execute()
+        # Solo procesar si hay filtro de sheets_urls (NO incluir todo el dominio)
+        if not sheets_urls:
+            logger.info("Sin URLs del Sheet para filtrar datos históricos")
+            return pd.DataFrame()
         
-        # Procesar respuesta
-        data = []
-
-        if 'rows' in response:
-            for row in response['rows']:
-                page_path = row['dimensionValues'][0]['value']
-                date_str = row['dimensionValues'][1]['value']
-
-                # Solo procesar si hay filtro de sheets_urls (NO incluir todo el dominio)
-                if not sheets_urls:
-                    continue
-
-                # Normalizar el pagePath de GA4 para comparar correctamente
-                normalized_page_path = normalize_url(f"{domain}{page_path}") if domain else normalize_url(page_path)
-
-                # Buscar coincidencia EXACTA con URLs del Sheet
-                match_found = False
-                for sheet_url in sheets_urls:
-                    # Comparar URLs normalizadas EXACTAMENTE
-                    if normalized_page_path == sheet_url:
-                        match_found = True
-                        break
-
-                if match_found:
-                    pageviews = int(row['metricValues'][0]['value'])
-                    sessions = int(row['metricValues'][1]['value'])
-                    users = int(row['metricValues'][2]['value'])
-
-                    data.append({
-                        'pagePath': page_path,
-                        'url_normalized': normalized_page_path,
-                        'date': datetime.strptime(date_str, '%Y%m%d'),
-                        'pageviews': pageviews,
-                        'sessions': sessions,
-                        'users': users
-                    })
-        
-        df = pd.DataFrame(data)
+        ga4_df = _run_ga4_report_for_sheet(client, property_id, request_body, sheets_urls, domain)
+        logger.info(f"GA4 historical response: {len(ga4_df)} rows from GA4")
+        logger.info(f"Filtering by {len(sheets_urls)} sheet URLs")
         
-        logger.info(f"GA4 historical response: {len(response.get('rows', []))} rows from GA4")
-        if sheets_urls:
-            logger.info(f"Filtering by {len(sheets_urls)} sheet URLs")
-        logger.info(f"Final dataframe: {len(df)} rows after filtering")
-        
-        if not df.empty:
-            # Aplicar granularidad temporal
-            if time_granularity == "week":
-                df['period'] = df['date'].dt.to_period('W').dt.start_time
-                df['period_formatted'] = df['period'].dt.strftime('%d/%m/%Y')
-            elif time_granularity == "month":
-                df['period'] = df['date'].dt.to_period('M').dt.start_time
-                df['period_formatted'] = df['period'].dt.strftime('%d/%m/%Y')
-            else:  # day
-                df['period'] = df['date']
-                df['period_formatted'] = df['period'].dt.strftime('%d/%m/%Y')
-            
-            logger.info(f"Datos históricos obtenidos: {len(df)} filas, granularidad: {time_granularity}")
+        df = build_historical_data(ga4_df, sheets_urls, domain, time_granularity)
         
         return df
         
     except Exception as e:
         logger.error(f"Error obteniendo datos históricos de GA4: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+# ==================== PRECALENTAMIENTO ====================
+
+_WARMUP_LOCK = threading.Lock()
+_WARMUP_THREAD = None
+# Evento de parada del thread actual: cada thread tiene el suyo, así reiniciar
+# mientras el anterior termina su medio en curso no lo deja sin parar ni lo revive
+_WARMUP_STOP = threading.Event()
+# Estado por medio: {'last_run', 'duration', 'error'}; más 'next_run' global
+_WARMUP_STATUS = {'medios': {}, 'next_run': None}
+
+def warm_up_medio(medio, media_config, credentials_file=WARMUP_CREDENTIALS_FILE):
+    """
+    Precarga los datasets por defecto de un medio: el Google Sheet, los
+    rangos GA4 que piden por defecto sus dashboards de redacción y de cliente
+    (sidebar, mes en curso y comparativa, ver dashboard_default_ranges) y el
+    crecimiento por defecto. Las llamadas y los argumentos son los mismos que
+    usa el dashboard, así que quedan en los mismos cachés.
+    """
+    property_id = media_config['property_id']
+    domain = media_config['domain']
+    credentials_file = media_config.get('credentials_file', credentials_file)
+
+    date_ranges = []
+    for page_type in ('redaccion', 'cliente'):
+        for date_range in dashboard_default_ranges(property_id, page_type):
+            if date_range not in date_ranges:
+                date_ranges.append(date_range)
+
+    sheets_filtered = get_sheet_partition(medio)
+
+    ga4_frames = get_ga4_data_planned(property_id, credentials_file, date_ranges)
+
+    merge_sheets_with_ga4(sheets_filtered, ga4_frames[DASHBOARD_DEFAULT_RANGE], domain)
+    sheets_urls_handle = get_sheet_partition_url_set(sheets_filtered)
+
+    get_ga4_growth_data(property_id, credentials_file, DASHBOARD_DEFAULT_GROWTH, sheets_urls_handle, domain)
+
+def _warmup_loop(interval, stagger, stop):
+    """
+    Recorre los medios de create_media_config cada interval segundos,
+    esperando stagger segundos entre uno y otro, hasta que se active stop
+    """
+    while not stop.is_set():
+        try:
+            medios = create_media_config()
+        except Exception as e:
+            logger.error(f"Precalentamiento: no se pudo leer la configuración de medios: {e}")
+            medios = {}
+
+        for medio, media_config in medios.items():
+            if stop.is_set():
+                break
+
+            started = time.monotonic()
+            error = None
+            try:
+                # Propiedades sin configurar (el ID puede venir como número desde secrets)
+                if not str(media_config.get('property_id') or '').strip('0'):
+                    continue
+                warm_up_medio(medio, media_config)
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Precalentamiento de {medio} falló: {e}")
+
+            with _WARMUP_LOCK:
+                _WARMUP_STATUS['medios'][medio] = {
+                    'last_run': datetime.now(),
+                    'duration': time.monotonic() - started,
+                    'error': error
+                }
+            stop.wait(stagger)
+
+        with _WARMUP_LOCK:
+            if stop is _WARMUP_STOP:
+                _WARMUP_STATUS['next_run'] = datetime.now() + timedelta(seconds=interval)
+        stop.wait(interval)
+
+    with _WARMUP_LOCK:
+        if stop is _WARMUP_STOP:
+            _WARMUP_STATUS['next_run'] = None
+
+def is_warmup_disabled():
+    """
+    True si un operador detuvo el precalentamiento (ver stop_warmup_scheduler)
+    """
+    return os.path.exists(WARMUP_DISABLED_FLAG)
+
+def _set_warmup_disabled(disabled):
+    """
+    Crea o borra la marca de precalentamiento detenido por un operador
+    """
+    try:
+        if disabled:
+            os.makedirs(os.path.dirname(WARMUP_DISABLED_FLAG), exist_ok=True)
+            with open(WARMUP_DISABLED_FLAG, 'w') as f:
+                f.write(datetime.now().isoformat())
+        elif os.path.exists(WARMUP_DISABLED_FLAG):
+            os.remove(WARMUP_DISABLED_FLAG)
+    except OSError as e:
+        logger.warning(f"No se pudo actualizar la marca de precalentamiento detenido: {e}")
+
+def start_warmup_scheduler(interval=None, stagger=None, force=False):
+    """
+    Inicia el precalentamiento en un thread de fondo, una sola vez por proceso.
+    Es seguro llamarla en cada rerun: si ya está corriendo no hace nada, y si
+    un operador lo detuvo no lo vuelve a iniciar.
+    
+    Args:
+        force: Inicio manual de un operador: borra la marca de detenido
+    
+    Returns:
+        True si el scheduler quedó corriendo
+    """
+    global _WARMUP_THREAD, _WARMUP_STOP
+    if not WARMUP_ENABLED:
+        return False
+    if force:
+        _set_warmup_disabled(False)
+    elif is_warmup_disabled():
+        return False
+
+    with _WARMUP_LOCK:
+        if _WARMUP_THREAD is not None and _WARMUP_THREAD.is_alive() and not _WARMUP_STOP.is_set():
+            return True
+        # Un thread anterior que todavía termina su medio en curso sale solo con su propio evento
+        _WARMUP_STOP = threading.Event()
+        _WARMUP_THREAD = threading.Thread(
+            target=_warmup_loop,
+            args=(interval or WARMUP_INTERVAL, WARMUP_STAGGER if stagger is None else stagger, _WARMUP_STOP),
+            name="dashboard-warmup",
+            daemon=True
+        )
+        _WARMUP_THREAD.start()
+    logger.info("Precalentamiento de dashboards iniciado")
+    return True
+
+def stop_warmup_scheduler(timeout=None):
+    """
+    Detiene el precalentamiento (termina después del medio en curso) y deja
+    la marca de detenido para que los dashboards no lo reinicien
+    """
+    _set_warmup_disabled(True)
+    with _WARMUP_LOCK:
+        _WARMUP_STOP.set()
+        thread = _WARMUP_THREAD
+    if thread is not None and timeout is not None:
+        thread.join(timeout)
+    logger.info("Precalentamiento de dashboards detenido")
+
+def get_warmup_status():
+    """
+    Estado del precalentamiento para el panel de administración de los dashboards
+    
+    Returns:
+        dict con 'running', 'disabled', 'next_run' y 'medios' ({medio: {'last_run', 'duration', 'error'}})
+    """
+    disabled = is_warmup_disabled()
+    with _WARMUP_LOCK:
+        return {
+            'running': _WARMUP_THREAD is not None and _WARMUP_THREAD.is_alive() and not _WARMUP_STOP.is_set(),
+            'disabled': disabled,
+            'next_run': _WARMUP_STATUS['next_run'],
+            'medios': {medio: dict(status) for medio, status in _WARMUP_STATUS['medios'].items()}
+        }